@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.contrib.auth.models import User
 from .models import Position, Candidate, ElectionSettings, AuditLog
+from .counters import sync_vote_counts
 
 @admin.register(Position)
 class PositionAdmin(admin.ModelAdmin):
@@ -14,6 +16,12 @@ class CandidateAdmin(admin.ModelAdmin):
     list_filter = ('position', 'is_active')
     search_fields = ('name', 'bio')
     ordering = ('position', 'name')
+    actions = ['reconcile_vote_counts']
+
+    @admin.action(description='Reconcile selected vote counts from counter shards')
+    def reconcile_vote_counts(self, request, queryset):
+        updated = sync_vote_counts(queryset)
+        self.message_user(request, f'Updated vote_count on {updated} candidate(s).')
 
 @admin.register(ElectionSettings)
 class ElectionSettingsAdmin(admin.ModelAdmin):
@@ -25,9 +33,21 @@ class ElectionSettingsAdmin(admin.ModelAdmin):
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ('timestamp', 'user', 'action', 'description', 'ip_address')
     list_filter = ('action', 'timestamp')
-    search_fields = ('user__username', 'description', 'ip_address')
+    search_fields = ('description', 'ip_address')
     readonly_fields = ('timestamp', 'user', 'action', 'description', 'ip_address', 'user_agent')
     ordering = ('-timestamp',)
+    # Users are in the main database; prefetch instead of joining
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('user')
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            user_ids = list(User.objects.filter(username__icontains=search_term).values_list('id', flat=True))
+            results |= queryset.filter(user_id__in=user_ids)
+        return results, may_have_duplicates
 
     def has_add_permission(self, request):
         return False  # Prevent manual creation of audit logs
@@ -0,0 +1,131 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger('election')
+
+# Flushes in a row that may fail to write anything before the entries are dropped
+MAX_FLUSH_ATTEMPTS = 5
+# Entries kept waiting while the database is unavailable, in batches
+MAX_BUFFERED_BATCHES = 50
+
+
+class AuditLogBuffer:
+    """Collects unsaved AuditLog rows in memory and writes them with bulk_create.
+
+    A background thread flushes every ``flush_interval`` seconds, or sooner
+    once ``batch_size`` entries are waiting. Whatever is left is flushed when
+    the process exits.
+
+    If a batch fails its rows are retried one at a time, so a bad row is
+    logged and dropped instead of holding back everything behind it. If no
+    row can be written at all the batch is kept for later, up to
+    MAX_FLUSH_ATTEMPTS flushes and MAX_BUFFERED_BATCHES batches; entries
+    beyond that are written to the error log and dropped.
+    """
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Forked workers start with an empty buffer and their own flusher
+        self._entries = []
+        self._failed_flushes = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            is_full = len(self._entries) >= self.batch_size
+            self._ensure_flusher()
+
+        if is_full:
+            self._wake.set()
+
+    def flush(self):
+        from .models import AuditLog
+
+        with self._lock:
+            entries, self._entries = self._entries, []
+
+        if not entries:
+            return 0
+
+        try:
+            AuditLog.objects.bulk_create(entries, batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(entries)} audit log entries as a batch: {e}")
+        else:
+            self._failed_flushes = 0
+            return len(entries)
+
+        # One at a time, so a bad row cannot hold back the rest
+        failed = []
+        for entry in entries:
+            try:
+                AuditLog.objects.bulk_create([entry])
+            except Exception as e:
+                failed.append((entry, e))
+        written = len(entries) - len(failed)
+
+        if written or not failed:
+            # The database is taking writes, so the failed rows are bad themselves
+            self._failed_flushes = 0
+            for entry, e in failed:
+                self._drop(entry, e)
+            return written
+
+        # Nothing could be written; the database is probably unavailable
+        self._failed_flushes += 1
+        if self._failed_flushes >= MAX_FLUSH_ATTEMPTS:
+            self._failed_flushes = 0
+            for entry, e in failed:
+                self._drop(entry, e)
+            return 0
+
+        with self._lock:
+            self._entries[:0] = entries
+            overflow = self._entries[:max(0, len(self._entries) - self.batch_size * MAX_BUFFERED_BATCHES)]
+            del self._entries[:len(overflow)]
+        for entry in overflow:
+            self._drop(entry, 'audit log buffer is full')
+        return 0
+
+    def _drop(self, entry, reason):
+        logger.error(
+            f"Dropped audit log entry ({entry.action}, user {entry.user_id}, {entry.ip_address}): "
+            f"{entry.description!r}: {reason}"
+        )
+
+    def _ensure_flusher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            close_old_connections()
+
+
+audit_buffer = AuditLogBuffer(
+    batch_size=settings.AUDIT_LOG_BATCH_SIZE,
+    flush_interval=settings.AUDIT_LOG_FLUSH_INTERVAL,
+)
+atexit.register(audit_buffer.flush)
+
+
+def flush_audit_log():
+    """Write out this process's pending entries, e.g. before showing the log"""
+    return audit_buffer.flush()
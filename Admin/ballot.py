@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+
+from .models import Position, Candidate
+
+BALLOT_VERSION_KEY = 'ballot:version'
+
+
+def bump_ballot_version():
+    """Point readers at a new snapshot; called whenever a Position or Candidate changes"""
+    cache.set(BALLOT_VERSION_KEY, time.time_ns(), None)
+
+
+def get_ballot_version():
+    version = cache.get(BALLOT_VERSION_KEY)
+    if version is None:
+        cache.add(BALLOT_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(BALLOT_VERSION_KEY)
+    return version
+
+
+def build_ballot():
+    """Active positions with their active candidates, as plain cacheable data"""
+    positions = Position.objects.filter(is_active=True).prefetch_related(
+        models.Prefetch(
+            'candidates',
+            queryset=Candidate.objects.filter(is_active=True)
+        )
+    )
+
+    return [
+        {
+            'id': position.id,
+            'name': position.name,
+            'description': position.description,
+            'candidates': [
+                {
+                    'id': candidate.id,
+                    'name': candidate.name,
+                    'bio': candidate.bio,
+                    'photo': candidate.photo_sources(),
+                }
+                for candidate in position.candidates.all()
+            ],
+        }
+        for position in positions
+    ]
+
+
+def get_ballot():
+    """Return the ballot snapshot for the current version, building it at most once"""
+    # Read the version before building so a concurrent bump is never masked
+    version = get_ballot_version()
+    key = f'ballot:snapshot:v2:{version}'
+
+    ballot = cache.get(key)
+    if ballot is None:
+        ballot = build_ballot()
+        cache.set(key, ballot, settings.BALLOT_CACHE_TIMEOUT)
+    return ballot
+
+
+def mark_voted_positions(ballot, voted_position_ids):
+    """Copy the shared ballot and mark the positions this voter has voted for.
+
+    Which candidate they picked is deliberately left out, so the page never
+    shows it.
+    """
+    voted = set(voted_position_ids)
+    return [dict(position, voted=position['id'] in voted) for position in ballot]
@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Candidate, VoteCounterShard
+
+RESULTS_VERSION_KEY = 'results:version'
+
+
+def get_shard_count():
+    return getattr(settings, 'VOTE_COUNTER_SHARDS', 8)
+
+
+def increment_vote_count(candidate_id, amount=1):
+    """Atomically add votes to one randomly chosen shard of a candidate's counter"""
+    shard = random.randrange(get_shard_count())
+    shard_rows = VoteCounterShard.objects.filter(candidate_id=candidate_id, shard=shard)
+
+    if shard_rows.update(count=F('count') + amount):
+        return
+
+    # First vote landing on this shard
+    try:
+        with transaction.atomic():
+            VoteCounterShard.objects.create(candidate_id=candidate_id, shard=shard, count=amount)
+    except IntegrityError:
+        # Another voter created it first
+        shard_rows.update(count=F('count') + amount)
+
+
+def bump_results_version():
+    """Mark the counters as changed once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(RESULTS_VERSION_KEY, time.time_ns(), None))
+
+
+def vote_counts():
+    """Return {candidate_id: total} summed over all counter shards"""
+    return dict(
+        VoteCounterShard.objects.values('candidate_id')
+        .annotate(total=Sum('count'))
+        .order_by()
+        .values_list('candidate_id', 'total')
+    )
+
+
+def sync_vote_counts(candidates=None):
+    """Fold the shard totals back into Candidate.vote_count, for all candidates or a queryset of them"""
+    counts = vote_counts()
+    candidates = list((Candidate.objects.all() if candidates is None else candidates).only('id', 'vote_count'))
+
+    changed = []
+    for candidate in candidates:
+        total = counts.get(candidate.id, 0)
+        if candidate.vote_count != total:
+            candidate.vote_count = total
+            changed.append(candidate)
+
+    Candidate.objects.bulk_update(changed, ['vote_count'])
+    return len(changed)
+
+
+@transaction.atomic
+def rebuild_vote_counters():
+    """Recount every candidate from the Vote table and reset the shards to match"""
+    totals = Candidate.objects.annotate(votes=Count('vote')).order_by().values_list('id', 'votes')
+
+    VoteCounterShard.objects.all().delete()
+    VoteCounterShard.objects.bulk_create([
+        VoteCounterShard(candidate_id=candidate_id, shard=0, count=votes)
+        for candidate_id, votes in totals
+        if votes
+    ])
+    bump_results_version()
+
+    return sync_vote_counts()
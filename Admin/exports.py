@@ -0,0 +1,93 @@
+import csv
+import json
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+
+from .models import Candidate
+from .tally import calculate_percentage
+from Voters.models import VoterProfile
+
+# Rows fetched from the database per round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() just returns the line for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), default=str) + '\n'
+
+
+def results_rows():
+    """(position, candidate, votes, percentage) for every active candidate"""
+    candidates = Candidate.objects.filter(is_active=True, position__is_active=True)
+
+    # One small aggregate for the per-position totals the percentages need
+    position_totals = dict(
+        candidates.values('position_id').annotate(total=Count('vote')).order_by().values_list('position_id', 'total')
+    )
+
+    rows = candidates.annotate(votes=Count('vote')).order_by(
+        'position__order', 'position__name', 'position_id', '-votes', 'name'
+    ).values_list('position_id', 'position__name', 'name', 'votes')
+
+    for position_id, position_name, name, votes in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield position_name, name, votes, calculate_percentage(votes, position_totals.get(position_id, 0))
+
+
+def audit_log_rows(queryset):
+    rows = queryset.order_by('timestamp', 'id').values_list(
+        'timestamp', 'user_id', 'action', 'description', 'ip_address', 'user_agent'
+    )
+
+    # Usernames come from the main database, one lookup per chunk
+    chunk = []
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield from _with_usernames(chunk)
+            chunk = []
+    yield from _with_usernames(chunk)
+
+
+def _with_usernames(rows):
+    user_ids = {row[1] for row in rows if row[1] is not None}
+    usernames = dict(User.objects.filter(id__in=user_ids).values_list('id', 'username')) if user_ids else {}
+    for timestamp, user_id, *rest in rows:
+        yield (timestamp, usernames.get(user_id, ''), *rest)
+
+
+def turnout_rows():
+    """(department, registered, voted, turnout %) for approved voters"""
+    rows = VoterProfile.objects.filter(category='Voter', is_approved=True).values('department').annotate(
+        registered=Count('id'),
+        voted=Count('id', filter=Q(has_voted=True)),
+    ).order_by('department').values_list('department', 'registered', 'voted')
+
+    for department, registered, voted in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield department or 'Unspecified', registered, voted, calculate_percentage(voted, registered)
+
+
+EXPORT_COLUMNS = {
+    'results': ['position', 'candidate', 'votes', 'percentage'],
+    'audit-logs': ['timestamp', 'user', 'action', 'description', 'ip_address', 'user_agent'],
+    'turnout': ['department', 'registered', 'voted', 'turnout_percentage'],
+}
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson'),
+}
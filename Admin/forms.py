@@ -2,7 +2,10 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.conf import settings
-from .models import Position, Candidate, ElectionSettings
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from .models import Position, Candidate, ElectionSettings, AuditLog
+from Voters.eligibility import registry_departments
 from Voters.models import VoterProfile, StudentRegistry
 
 class StudentRegistryForm(forms.ModelForm):
@@ -18,6 +21,15 @@ class StudentRegistryForm(forms.ModelForm):
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'})
         }
 
+class StudentImportForm(forms.Form):
+    file = forms.FileField(
+        widget=forms.FileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx'
+        }),
+        help_text='Columns: reg_number, full_name, email, department, year_of_study and optionally is_active'
+    )
+
 class AdminRegistrationForm(UserCreationForm):
     email = forms.EmailField(
         required=True,
@@ -184,3 +196,59 @@ class ElectionSettingsForm(forms.ModelForm):
             raise forms.ValidationError("Voting end time must be after voting start time.")
         
         return cleaned_data
+
+
+class AuditLogFilterForm(forms.Form):
+    action = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All actions')] + AuditLog.ACTION_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    user = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Username'
+        })
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    def filter_queryset(self, queryset):
+        data = self.cleaned_data
+        if data.get('action'):
+            queryset = queryset.filter(action=data['action'])
+        if data.get('user'):
+            # Audit rows and users are in different databases, so no join
+            user_ids = list(User.objects.filter(username=data['user']).values_list('id', flat=True))
+            queryset = queryset.filter(user_id__in=user_ids)
+        # Plain range comparisons so the (timestamp, id) indexes stay usable
+        if data.get('date_from'):
+            start = timezone.make_aware(datetime.combine(data['date_from'], time.min))
+            queryset = queryset.filter(timestamp__gte=start)
+        if data.get('date_to'):
+            end = timezone.make_aware(datetime.combine(data['date_to'] + timedelta(days=1), time.min))
+            queryset = queryset.filter(timestamp__lt=end)
+        return queryset
+
+
+class StudentFilterForm(forms.Form):
+    department = forms.ChoiceField(
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['department'].choices = [('', 'All departments')] + [(d, d) for d in registry_departments()]
+
+    def filter_queryset(self, queryset):
+        if self.cleaned_data.get('department'):
+            queryset = queryset.filter(department=self.cleaned_data['department'])
+        return queryset
@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('election')
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+WORKERS_KEY = 'perf:workers'
+
+
+def _bucket_index(wall_ms):
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if wall_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _new_entry():
+    return {
+        'count': 0,
+        'wall_ms': 0.0,
+        'queries': 0,
+        'max_queries': 0,
+        'db_ms': 0.0,
+        'duplicate_requests': 0,
+        'worst_duplicate': (0, ''),
+        'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    }
+
+
+class PerformanceStats:
+    """Rolling per-URL request statistics for this process.
+
+    Requests are counted into fixed windows of ``window_seconds``; only the
+    newest ``windows`` of them are kept.
+    """
+
+    def __init__(self, window_seconds, windows):
+        self.window_seconds = window_seconds
+        self.windows = windows
+        self._lock = threading.Lock()
+        self._data = {}  # window start -> {url name: entry}
+
+    def record(self, url_name, wall_ms, queries, db_ms, duplicate):
+        window = int(time.time() // self.window_seconds) * self.window_seconds
+
+        with self._lock:
+            entry = self._data.setdefault(window, {}).setdefault(url_name, _new_entry())
+            entry['count'] += 1
+            entry['wall_ms'] += wall_ms
+            entry['queries'] += queries
+            entry['max_queries'] = max(entry['max_queries'], queries)
+            entry['db_ms'] += db_ms
+            entry['histogram'][_bucket_index(wall_ms)] += 1
+            if duplicate:
+                entry['duplicate_requests'] += 1
+                entry['worst_duplicate'] = max(entry['worst_duplicate'], duplicate)
+
+            oldest = window - self.window_seconds * (self.windows - 1)
+            for start in [w for w in self._data if w < oldest]:
+                del self._data[start]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                window: {name: dict(entry, histogram=list(entry['histogram'])) for name, entry in urls.items()}
+                for window, urls in self._data.items()
+            }
+
+
+def merge_snapshots(snapshots, window_seconds, windows):
+    """Combine worker snapshots into one summary row per URL name, slowest first"""
+    oldest = time.time() - window_seconds * windows
+    merged = {}
+
+    for snapshot in snapshots:
+        for window, urls in snapshot.items():
+            if window < oldest:
+                continue
+            for name, entry in urls.items():
+                total = merged.setdefault(name, _new_entry())
+                for key in ('count', 'wall_ms', 'queries', 'db_ms', 'duplicate_requests'):
+                    total[key] += entry[key]
+                total['max_queries'] = max(total['max_queries'], entry['max_queries'])
+                total['worst_duplicate'] = max(total['worst_duplicate'], tuple(entry['worst_duplicate']))
+                total['histogram'] = [a + b for a, b in zip(total['histogram'], entry['histogram'])]
+
+    rows = []
+    for name, total in merged.items():
+        count = total['count']
+        rows.append({
+            'url_name': name,
+            'count': count,
+            'total_ms': total['wall_ms'],
+            'avg_ms': total['wall_ms'] / count,
+            'p50_ms': _histogram_percentile(total['histogram'], 50),
+            'p95_ms': _histogram_percentile(total['histogram'], 95),
+            'p99_ms': _histogram_percentile(total['histogram'], 99),
+            'avg_queries': total['queries'] / count,
+            'max_queries': total['max_queries'],
+            'avg_db_ms': total['db_ms'] / count,
+            'duplicate_requests': total['duplicate_requests'],
+            'worst_duplicate_count': total['worst_duplicate'][0],
+            'worst_duplicate_sql': total['worst_duplicate'][1],
+            'histogram': total['histogram'],
+        })
+
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def _histogram_percentile(histogram, pct):
+    """Upper bound of the bucket holding the pct-th request (None if above the last bound)"""
+    target = sum(histogram) * pct / 100
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if count and seen >= target:
+            return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+
+# One set of stats per process, however many handlers load the middleware
+_process_stats = None
+
+
+def get_process_stats():
+    global _process_stats
+    if _process_stats is None:
+        _process_stats = PerformanceStats(settings.PERF_WINDOW_SECONDS, settings.PERF_WINDOWS)
+    return _process_stats
+
+
+def collect_stats():
+    """Merged statistics from every worker that has published recently"""
+    pids = cache.get(WORKERS_KEY) or set()
+    snapshots = cache.get_many([f'perf:worker:{pid}' for pid in pids]).values()
+    return merge_snapshots(snapshots, settings.PERF_WINDOW_SECONDS, settings.PERF_WINDOWS)
+
+
+class PerformanceMiddleware:
+    """Opt-in per-request timing, query counting and duplicate-query detection.
+
+    Enabled with PERF_INSTRUMENTATION = True. Each worker aggregates in
+    memory and publishes its rolling stats to the shared cache (and the log)
+    every PERF_PUBLISH_INTERVAL seconds; the admin performance page merges
+    them.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.stats = get_process_stats()
+        self.next_publish = time.monotonic() + settings.PERF_PUBLISH_INTERVAL
+
+    def __call__(self, request):
+        queries = Counter()
+        db_time = [0.0]
+
+        def track_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_time[0] += time.perf_counter() - start
+                queries[sql] += 1
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(track_query))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        url_name = (resolver_match.view_name if resolver_match else None) or 'unresolved'
+
+        duplicate = None
+        if queries:
+            sql, repeats = queries.most_common(1)[0]
+            if repeats >= settings.PERF_DUPLICATE_QUERY_THRESHOLD:
+                duplicate = (repeats, sql[:500])
+                logger.warning(f"PERF: {url_name} ran the same query {repeats} times: {sql[:200]}")
+
+        self.stats.record(url_name, wall_ms, sum(queries.values()), db_time[0] * 1000, duplicate)
+
+        if time.monotonic() >= self.next_publish:
+            self.next_publish = time.monotonic() + settings.PERF_PUBLISH_INTERVAL
+            self.publish()
+
+        return response
+
+    def publish(self):
+        pid = os.getpid()
+        timeout = settings.PERF_WINDOW_SECONDS * settings.PERF_WINDOWS
+        snapshot = self.stats.snapshot()
+        cache.set(f'perf:worker:{pid}', snapshot, timeout)
+
+        # Drop workers whose snapshots have expired (restarted or idle)
+        pids = cache.get(WORKERS_KEY) or set()
+        published = cache.get_many([f'perf:worker:{p}' for p in pids | {pid}])
+        live = {int(key.rsplit(':', 1)[1]) for key in published}
+        if live != pids:
+            cache.set(WORKERS_KEY, live, None)
+
+        for row in merge_snapshots([snapshot], settings.PERF_WINDOW_SECONDS, settings.PERF_WINDOWS):
+            logger.info(
+                f"PERF: {row['url_name']} - {row['count']} requests - avg {row['avg_ms']:.1f}ms "
+                f"p95 <={row['p95_ms']}ms - {row['avg_queries']:.1f} queries "
+                f"({row['avg_db_ms']:.1f}ms) - {row['duplicate_requests']} with duplicate queries"
+            )
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .ballot import BALLOT_VERSION_KEY
+from .counters import RESULTS_VERSION_KEY, vote_counts
+from .stats import election_stats
+
+
+def read_results():
+    """Current vote counts and turnout, cached per counters/ballot version.
+
+    Every worker streaming to admins shares the cached copy, so the database
+    is read once per change rather than once per connection.
+    """
+    versions = cache.get_many([RESULTS_VERSION_KEY, BALLOT_VERSION_KEY])
+    key = f"results:live:{versions.get(RESULTS_VERSION_KEY)}:{versions.get(BALLOT_VERSION_KEY)}"
+
+    results = cache.get(key)
+    if results is None:
+        stats = election_stats()
+        results = {
+            'candidates': {str(candidate_id): votes for candidate_id, votes in vote_counts().items()},
+            'total_voters': stats['total_voters'],
+            'voted_count': stats['voted_count'],
+            'turnout': stats['turnout'],
+        }
+        cache.set(key, results, settings.RESULTS_STREAM_KEEPALIVE * 4)
+    return results
+
+
+def results_delta(old, new):
+    """The parts of new that differ from old; candidates that dropped out read 0"""
+    delta = {key: value for key, value in new.items() if key != 'candidates' and old.get(key) != value}
+    candidates = {
+        candidate_id: votes for candidate_id, votes in new['candidates'].items()
+        if old['candidates'].get(candidate_id) != votes
+    }
+    candidates.update((candidate_id, 0) for candidate_id in old['candidates'].keys() - new['candidates'].keys())
+    if candidates:
+        delta['candidates'] = candidates
+    return delta
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ResultsBroadcaster:
+    """Fans one poll of the results out to every stream on an event loop.
+
+    While at least one admin is connected, a single task checks the version
+    stamps every RESULTS_STREAM_INTERVAL seconds and reloads the results
+    only when votes have landed. Streams wake up on each reload and send
+    what changed since their last message, or a full snapshot if the ballot
+    itself changed (candidates added or removed).
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.results = None
+        self.ballot_version = None
+        self.generation = 0
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self._task = None
+
+    async def _poll(self):
+        versions = None
+        while self.subscribers:
+            current = await sync_to_async(cache.get_many)([RESULTS_VERSION_KEY, BALLOT_VERSION_KEY])
+            if current != versions or self.results is None:
+                versions = current
+                self.results = await sync_to_async(read_results)()
+                self.ballot_version = current.get(BALLOT_VERSION_KEY)
+                self.generation += 1
+                self._changed.set()
+                self._changed = asyncio.Event()
+            await asyncio.sleep(self.interval)
+        self._task = None
+
+    async def stream(self, keepalive):
+        self.subscribers += 1
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._poll())
+
+        sent = sent_ballot = None
+        seen = 0
+        try:
+            while True:
+                if self.results is not None and self.generation != seen:
+                    seen = self.generation
+                    if sent is None or self.ballot_version != sent_ballot:
+                        yield format_event('snapshot', self.results)
+                    else:
+                        delta = results_delta(sent, self.results)
+                        if delta:
+                            yield format_event('delta', delta)
+                    sent, sent_ballot = self.results, self.ballot_version
+
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.subscribers -= 1
+
+
+# One broadcaster per event loop (normally one per ASGI worker)
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster():
+    loop = asyncio.get_running_loop()
+    if loop not in _broadcasters:
+        _broadcasters[loop] = ResultsBroadcaster(settings.RESULTS_STREAM_INTERVAL)
+    return _broadcasters[loop]
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Admin.models import AuditLog
+from Admin.student_import import StudentImportError, import_students, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import the student registry from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with a header row')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+
+        def progress(result):
+            self.stdout.write(f'  {result}')
+
+        try:
+            with open(path, 'rb') as file:
+                result = import_students(
+                    iter_rows(file, path),
+                    chunk_size=options['chunk_size'],
+                    progress=progress
+                )
+        except (OSError, StudentImportError) as e:
+            raise CommandError(str(e))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f'Row {row_number}: {message}')
+
+        AuditLog.log_action(
+            user=None,
+            action='ADMIN_ACTION',
+            description=f"Imported student registry from {path}: {result}"
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Import finished. {result}'))
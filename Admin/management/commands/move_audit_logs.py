@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Admin.models import AuditLog
+from Admin.routers import AUDIT_DB
+
+
+class Command(BaseCommand):
+    help = 'Move audit log entries written before the audit database existed out of the main database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        moved = 0
+
+        while True:
+            batch = list(AuditLog.objects.using('default').order_by('id')[:batch_size])
+            if not batch:
+                break
+
+            # New ids in the audit database; keep the original order
+            copies = [
+                AuditLog(**{f.attname: getattr(entry, f.attname) for f in AuditLog._meta.concrete_fields if not f.primary_key})
+                for entry in batch
+            ]
+            with transaction.atomic(using=AUDIT_DB):
+                AuditLog.objects.using(AUDIT_DB).bulk_create(copies)
+            AuditLog.objects.using('default').filter(id__in=[entry.id for entry in batch]).delete()
+
+            moved += len(batch)
+            self.stdout.write(f'Moved {moved} entries...')
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} audit log entries to the {AUDIT_DB} database.'))
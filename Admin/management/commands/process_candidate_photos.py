@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from Admin import photos
+from Admin.models import Candidate
+
+
+class Command(BaseCommand):
+    help = 'Re-encode candidate photos uploaded before processing and build their thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reprocess photos that already have thumbnails')
+
+    def handle(self, *args, **options):
+        candidates = Candidate.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            candidates = candidates.filter(photo_variants={})
+
+        processed = 0
+        for candidate in candidates.iterator():
+            try:
+                with candidate.photo.open('rb') as f:
+                    candidate.photo.name, candidate.photo_variants = photos.process_photo(f)
+            except (OSError, ValueError) as e:
+                self.stderr.write(f'Skipped {candidate}: {e}')
+                continue
+
+            candidate.save(update_fields=['photo', 'photo_variants', 'updated_at'])
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} candidate photos.'))
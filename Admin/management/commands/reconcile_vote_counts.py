@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from Admin.counters import rebuild_vote_counters, sync_vote_counts
+from Admin.stats import rebuild_election_stats
+
+
+class Command(BaseCommand):
+    help = 'Fold the sharded vote counters back into Candidate.vote_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recount from the Vote table instead of trusting the counter shards, and rebuild the dashboard statistics',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            updated = rebuild_vote_counters()
+        else:
+            updated = sync_vote_counts()
+
+        self.stdout.write(self.style.SUCCESS(f'Updated vote_count on {updated} candidate(s).'))
+
+        if options['rebuild']:
+            totals = rebuild_election_stats()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {totals} election statistics.'))
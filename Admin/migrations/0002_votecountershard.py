@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_counter_shards(apps, schema_editor):
+    Candidate = apps.get_model('Admin', 'Candidate')
+    VoteCounterShard = apps.get_model('Admin', 'VoteCounterShard')
+    VoteCounterShard.objects.bulk_create([
+        VoteCounterShard(candidate_id=candidate_id, shard=0, count=vote_count)
+        for candidate_id, vote_count in Candidate.objects.filter(vote_count__gt=0).values_list('id', 'vote_count')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Admin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='Admin.candidate')),
+            ],
+            options={
+                'unique_together': {('candidate', 'shard')},
+            },
+        ),
+        migrations.RunPython(seed_counter_shards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:33
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_election_stats(apps, schema_editor):
+    """Start the running totals from what is already recorded (see Admin/stats.py)"""
+    ElectionStat = apps.get_model('Admin', 'ElectionStat')
+    VoterProfile = apps.get_model('Voters', 'VoterProfile')
+    Vote = apps.get_model('Voters', 'Vote')
+
+    totals = Counter()
+    voters = (
+        VoterProfile.objects.filter(category='Voter', is_approved=True)
+        .values('department').annotate(registered=Count('id'), voted=Count('id', filter=Q(has_voted=True)))
+        .order_by()
+    )
+    for row in voters:
+        department = row['department'] or ''
+        totals.update({
+            ('voters', ''): row['registered'], ('department_voters', department): row['registered'],
+            ('voted', ''): row['voted'], ('department_voted', department): row['voted'],
+        })
+    for row in Vote.objects.values('position_id').annotate(votes=Count('id')).order_by():
+        totals.update({('votes', ''): row['votes'], ('position_votes', str(row['position_id'])): row['votes']})
+
+    ElectionStat.objects.bulk_create([
+        ElectionStat(kind=kind, key=key, value=value) for (kind, key), value in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Admin', '0006_candidate_photo_variants'),
+        ('Voters', '0005_merkle_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30)),
+                ('key', models.CharField(blank=True, max_length=100)),
+                ('value', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+        migrations.RunPython(count_election_stats, migrations.RunPython.noop),
+    ]
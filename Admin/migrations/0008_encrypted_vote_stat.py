@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:05
+
+from django.db import migrations
+
+
+def count_encrypted_votes(apps, schema_editor):
+    """Start the encrypted ballot total from the ballots already stored (see Admin/stats.py)"""
+    ElectionStat = apps.get_model('Admin', 'ElectionStat')
+    EncryptedVote = apps.get_model('Voters', 'EncryptedVote')
+
+    ElectionStat.objects.update_or_create(
+        kind='encrypted_votes', key='', defaults={'value': EncryptedVote.objects.count()}
+    )
+
+
+def remove_encrypted_votes(apps, schema_editor):
+    apps.get_model('Admin', 'ElectionStat').objects.filter(kind='encrypted_votes').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Admin', '0007_election_stats'),
+        ('Voters', '0005_merkle_tree'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_encrypted_votes, remove_encrypted_votes),
+    ]
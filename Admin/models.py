@@ -2,8 +2,14 @@ from django.db import models
 from django.contrib.auth.models import User
 from cryptography.fernet import Fernet
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
 import logging
 
+from . import photos
+
 logger = logging.getLogger('election')
 
 class Position(models.Model):
@@ -24,6 +30,8 @@ class Candidate(models.Model):
     name = models.CharField(max_length=100)
     bio = models.TextField()
     photo = models.ImageField(upload_to='candidates/', blank=True, null=True)
+    # Thumbnail and WebP file names built from the photo, see Admin/photos.py
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='candidates')
     vote_count = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
@@ -37,11 +45,71 @@ class Candidate(models.Model):
     def __str__(self):
         return f"{self.name} - {self.position.name}"
     
+    def clean(self):
+        if self.position_id and self.moves_recorded_votes():
+            raise ValidationError({'position': 'This candidate already has votes and cannot be moved to another position.'})
+    
+    def moves_recorded_votes(self):
+        """True if votes already cast for this candidate belong to another position"""
+        return self.pk is not None and self.vote_set.exclude(position_id=self.position_id).exists()
+    
+    def save(self, *args, **kwargs):
+        # Votes and encrypted ballots (hashed into the ballot tree) keep the position they were cast for
+        if self.moves_recorded_votes():
+            raise ValidationError('A candidate with recorded votes cannot be moved to another position.')
+        # A new upload is replaced by its stripped, resized and thumbnailed versions
+        if self.photo and not self.photo._committed:
+            self.photo, self.photo_variants = photos.process_photo(self.photo)
+        elif not self.photo:
+            self.photo_variants = {}
+        super().save(*args, **kwargs)
+    
+    def photo_sources(self):
+        return photos.photo_sources(self.photo, self.photo_variants)
+    
     def get_vote_percentage(self):
-        total_votes = sum(c.vote_count for c in self.position.candidates.filter(is_active=True))
-        if total_votes == 0:
-            return 0
-        return round((self.vote_count / total_votes) * 100, 1)
+        from .tally import calculate_percentage, candidate_vote_counts
+
+        # Candidates that came out of tally_results() already carry it
+        if hasattr(self, 'percentage'):
+            return self.percentage
+
+        counts = candidate_vote_counts(position_id=self.position_id)
+        return calculate_percentage(counts.get(self.id, 0), sum(counts.values()))
+
+class VoteCounterShard(models.Model):
+    """One slice of a candidate's vote counter.
+
+    Votes are spread across several rows per candidate so concurrent voters
+    don't all update the same row. The candidate's total is the sum of its
+    shards and is folded back into Candidate.vote_count by reconciliation.
+    """
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['candidate', 'shard']
+
+    def __str__(self):
+        return f"{self.candidate} - shard {self.shard}: {self.count}"
+
+class ElectionStat(models.Model):
+    """One running total for the admin dashboard, kept in step with each vote.
+
+    kind is e.g. 'voted' or 'position_votes', key narrows it down (a
+    position id or department; blank for election-wide totals). See
+    Admin/stats.py.
+    """
+    kind = models.CharField(max_length=30)
+    key = models.CharField(max_length=100, blank=True)
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['kind', 'key']
+
+    def __str__(self):
+        return f"{self.kind}[{self.key}] = {self.value}"
 
 class ElectionSettings(models.Model):
     name = models.CharField(max_length=200, default="Student Government Election")
@@ -59,9 +127,23 @@ class ElectionSettings(models.Model):
     def __str__(self):
         return self.name
     
+    CACHE_KEY = 'election_settings:current'
+
     @classmethod
     def get_current(cls):
-        return cls.objects.filter(is_active=True).first()
+        """Return the active settings, served from the shared cache when possible"""
+        cached = cache.get(cls.CACHE_KEY)
+        if cached is not None:
+            # Wrapped in a tuple so "no active election" is cached too
+            return cached[0]
+
+        current = cls.objects.filter(is_active=True).first()
+        cache.set(cls.CACHE_KEY, (current,), settings.ELECTION_SETTINGS_CACHE_TIMEOUT)
+        return current
+
+    @classmethod
+    def clear_cache(cls):
+        cache.delete(cls.CACHE_KEY)
 
 class AuditLog(models.Model):
     ACTION_CHOICES = [
@@ -78,15 +160,23 @@ class AuditLog(models.Model):
         ('POSITION_DELETE', 'Position Deleted'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # Lives in the audit database (see AuditRouter), so no database-level constraint to auth_user
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     description = models.TextField()
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the action happens, not when a buffered batch is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-timestamp']
+        # Keyset pagination on (timestamp, id), optionally narrowed by action or user
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='auditlog_timestamp_id_idx'),
+            models.Index(fields=['action', 'timestamp', 'id'], name='auditlog_action_ts_idx'),
+            models.Index(fields=['user', 'timestamp', 'id'], name='auditlog_user_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.action} - {self.user} - {self.timestamp}"
@@ -100,7 +190,7 @@ class AuditLog(models.Model):
             ip_address = cls.get_client_ip(request)
             user_agent = request.META.get('HTTP_USER_AGENT', '')
         
-        log_entry = cls.objects.create(
+        log_entry = cls(
             user=user,
             action=action,
             description=description,
@@ -108,6 +198,15 @@ class AuditLog(models.Model):
             user_agent=user_agent
         )
         
+        if settings.AUDIT_LOG_BUFFERED and action not in settings.AUDIT_LOG_SYNC_ACTIONS:
+            from .audit import audit_buffer
+            # Queue only once the surrounding transaction (e.g. a vote) commits
+            transaction.on_commit(lambda: audit_buffer.add(log_entry))
+        else:
+            # The audit database has its own transactions, so wait for the vote
+            # database's: a rolled-back vote leaves no entry behind
+            transaction.on_commit(log_entry.save, using='default')
+        
         # Also log to file
         logger.info(f"AUDIT: {action} - User: {user} - Description: {description} - IP: {ip_address}")
         
@@ -0,0 +1,79 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj, field):
+    value = f"{getattr(obj, field).isoformat()}|{obj.pk}"
+    return urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (datetime, id) from a cursor, or None if it is malformed"""
+    try:
+        value, pk = urlsafe_b64decode(cursor.encode()).decode().split('|')
+        timestamp = parse_datetime(value)
+        return (timestamp, int(pk)) if timestamp else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_other_pages(self):
+        return bool(self.next_cursor or self.previous_cursor)
+
+
+def paginate_keyset(queryset, field, after=None, before=None, per_page=50):
+    """Newest-first keyset pagination on (field, id).
+
+    Pages are selected with a range condition on an indexed (field, id)
+    pair instead of OFFSET, so every page costs the same as the first one.
+    ``after`` moves to older rows, ``before`` back to newer ones.
+    """
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+
+    if before:
+        value, pk = before
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:per_page + 1]
+        )
+        has_newer = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_older = True
+    else:
+        if after:
+            value, pk = after
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+        rows = list(queryset.order_by(f'-{field}', '-pk')[:per_page + 1])
+        has_older = len(rows) > per_page
+        items = rows[:per_page]
+        has_newer = after is not None
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1], field) if items and has_older else None,
+        previous_cursor=encode_cursor(items[0], field) if items and has_newer else None,
+    )
+
+
+def filter_query_string(request):
+    """The current GET parameters without the cursors, for building page links"""
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    return params.urlencode()
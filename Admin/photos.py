@@ -0,0 +1,96 @@
+import hashlib
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+UPLOAD_DIR = 'candidates'
+
+# Longest side of the stored full-size photo
+PHOTO_MAX_SIZE = 1200
+
+# Square crops served to voters; the ballot shows photos at 120px
+PHOTO_VARIANT_SIZES = [120, 240, 480]
+
+# Names produced here are content hashes, so their bytes never change
+PROCESSED_NAME = re.compile(r'^[0-9a-f]{16}(-\d+)?\.(jpg|webp)$')
+
+
+def _flatten(image):
+    """Apply the EXIF orientation and return an RGB image on a white background"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt, **options):
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _store(name, content):
+    # Same name means same source bytes, so an existing file is already right
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(content))
+
+
+def process_photo(file):
+    """Re-encode an uploaded photo and build its thumbnails.
+
+    Re-encoding drops EXIF (including GPS) and any other embedded metadata.
+    Returns the stored name of the full-size JPEG and a dict of variant
+    names: {'jpeg': {'120': name, ...}, 'webp': {'120': name, ...}}.
+    """
+    file.seek(0)
+    data = file.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+
+    with Image.open(BytesIO(data)) as source:
+        image = _flatten(source)
+
+    full = image.copy()
+    full.thumbnail((PHOTO_MAX_SIZE, PHOTO_MAX_SIZE), Image.LANCZOS)
+    name = _store(
+        f'{UPLOAD_DIR}/{digest}.jpg',
+        _encode(full, 'JPEG', quality=85, optimize=True, progressive=True)
+    )
+
+    variants = {'jpeg': {}, 'webp': {}}
+    for size in PHOTO_VARIANT_SIZES:
+        square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        variants['jpeg'][str(size)] = _store(
+            f'{UPLOAD_DIR}/{digest}-{size}.jpg',
+            _encode(square, 'JPEG', quality=82, optimize=True, progressive=True)
+        )
+        variants['webp'][str(size)] = _store(
+            f'{UPLOAD_DIR}/{digest}-{size}.webp',
+            _encode(square, 'WEBP', quality=80, method=6)
+        )
+
+    return name, variants
+
+
+def photo_sources(photo, variants):
+    """src/srcset values for a <picture>, or None when there is no photo"""
+    if not photo:
+        return None
+    if not variants:
+        # Uploaded before processing existed
+        return {'src': photo.url, 'jpeg_srcset': '', 'webp_srcset': ''}
+
+    def srcset(names):
+        return ', '.join(f'{default_storage.url(name)} {size}w' for size, name in names.items())
+
+    return {
+        'src': default_storage.url(variants['jpeg'][str(PHOTO_VARIANT_SIZES[1])]),
+        'jpeg_srcset': srcset(variants['jpeg']),
+        'webp_srcset': srcset(variants['webp']),
+    }
@@ -0,0 +1,147 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .ballot import get_ballot_version
+from .stats import election_stats
+from .tally import tally_results
+from Voters.models import Vote, VoterProfile
+
+# ReportLab is optional; without it the PDF export is switched off
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.pdfgen import canvas
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+# fcntl locks stop several workers building the same report at once (POSIX only)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+_build_lock = threading.Lock()
+
+
+def results_version(election_settings):
+    """Fingerprint of everything the results report shows.
+
+    Two small aggregates instead of a full tally: the vote count and newest
+    vote id change whenever votes are cast or removed, the voter counts cover
+    turnout, and the ballot version covers position and candidate edits.
+    """
+    votes = Vote.objects.aggregate(count=Count('id'), last=Max('id'))
+    voters = VoterProfile.objects.aggregate(
+        total=Count('id', filter=Q(category='Voter', is_approved=True)),
+        voted=Count('id', filter=Q(category='Voter', is_approved=True, has_voted=True)),
+    )
+    published = election_settings.results_published if election_settings else False
+
+    fingerprint = (
+        f"{votes['count']}:{votes['last']}:{voters['total']}:{voters['voted']}:"
+        f"{get_ballot_version()}:{published}"
+    )
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+def render_results_pdf(results_data, total_voters, voted_count):
+    total_all_votes = sum(item['total_votes'] for item in results_data)
+
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    x_margin = 1 * inch
+    y = height - 1 * inch
+    line_height = 14
+
+    def draw_line(text, font_size=12):
+        nonlocal y
+        if y <= 1 * inch:
+            p.showPage()
+            y = height - 1 * inch
+        p.setFont("Helvetica", font_size)
+        p.drawString(x_margin, y, text)
+        y -= line_height
+
+    # PDF Title
+    draw_line("Election Results Report", 14)
+    draw_line(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    draw_line("")
+
+    draw_line(f"Total Registered Voters: {total_voters}")
+    draw_line(f"Total Voted: {voted_count}")
+    draw_line(f"Total Votes Counted: {total_all_votes}")
+    draw_line("")
+
+    for item in results_data:
+        draw_line(f"Position: {item['position'].name}", 13)
+        draw_line(f"Total Votes for this Position: {item['total_votes']}")
+        for candidate in item['candidates']:
+            draw_line(f" - {candidate.name}: {candidate.vote_count} votes ({candidate.percentage}%)")
+        draw_line("")
+
+    p.save()
+    return buffer.getvalue()
+
+
+def _build(path):
+    results_data = tally_results()
+    # Same figures as the results page: approved voters only
+    stats = election_stats()
+    pdf = render_results_pdf(results_data, stats['total_voters'], stats['voted_count'])
+
+    # Write beside the target and rename so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+
+    # Older versions are never served again; requests already reading one keep their open file
+    for old in path.parent.glob('results-*.pdf'):
+        if old != path:
+            try:
+                old.unlink(missing_ok=True)
+            except OSError:
+                pass  # Still open on a platform that cannot unlink open files
+
+
+def open_results_pdf(version):
+    """Return the report for this version as an open binary file, building it at most once.
+
+    Concurrent requests for the same version wait for the first one's build
+    (across threads, and across worker processes where fcntl is available).
+    Builds prune older versions, so the file is opened under the same lock
+    rather than handing back a path a newer build could remove.
+    """
+    report_dir = settings.RESULTS_REPORT_DIR
+    report_dir.mkdir(parents=True, exist_ok=True)
+    path = report_dir / f'results-{version}.pdf'
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        pass
+
+    with _build_lock:
+        if not FCNTL_AVAILABLE:
+            if not path.exists():
+                _build(path)
+            return open(path, 'rb')
+
+        with open(report_dir / '.build.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not path.exists():
+                    _build(path)
+                return open(path, 'rb')
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,40 @@
+from django.conf import settings
+
+AUDIT_DB = 'audit'
+
+
+def _routed_labels():
+    return {label.lower() for label in settings.AUDIT_DATABASE_MODELS}
+
+
+class AuditRouter:
+    """Keep the models in AUDIT_DATABASE_MODELS in the 'audit' SQLite file.
+
+    Their writes then take the audit file's lock instead of competing with
+    ballots for the main database's. Every other model is pinned to
+    'default', including lookups that start from an audit row (for example
+    AuditLog.user), which would otherwise follow the row into 'audit'.
+    """
+
+    def _routed(self, model):
+        return model._meta.label.lower() in _routed_labels()
+
+    def db_for_read(self, model, **hints):
+        return AUDIT_DB if self._routed(model) else 'default'
+
+    def db_for_write(self, model, **hints):
+        return AUDIT_DB if self._routed(model) else 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # AuditLog.user points across files; the column is not a real foreign key
+        if self._routed(obj1) or self._routed(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        label = f'{app_label}.{model_name}'.lower()
+        if db == AUDIT_DB:
+            return label in _routed_labels()
+        # The main database keeps (empty) copies of the routed tables, so deleting
+        # a user still finds an AuditLog table to clear user_id on
+        return None
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ElectionSettings, Position, Candidate
+from .ballot import bump_ballot_version
+
+
+@receiver([post_save, post_delete], sender=ElectionSettings)
+def clear_election_settings_cache(sender, **kwargs):
+    ElectionSettings.clear_cache()
+
+
+@receiver([post_save, post_delete], sender=Position)
+@receiver([post_save, post_delete], sender=Candidate)
+def invalidate_ballot(sender, **kwargs):
+    bump_ballot_version()
+
@@ -0,0 +1,132 @@
+from collections import Counter, defaultdict
+from functools import reduce
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+from .models import ElectionStat
+from .tally import calculate_percentage
+
+# Approved voters and how many of them have finished voting
+VOTERS = 'voters'
+VOTED = 'voted'
+DEPARTMENT_VOTERS = 'department_voters'
+DEPARTMENT_VOTED = 'department_voted'
+
+# Vote rows, in total and per position id
+VOTES = 'votes'
+POSITION_VOTES = 'position_votes'
+
+# EncryptedVote rows, counted separately so the dashboard shows if the two tables drift apart
+ENCRYPTED_VOTES = 'encrypted_votes'
+
+
+def voter_stats(category, is_approved, has_voted, department):
+    """What one voter profile contributes to the totals"""
+    if category != 'Voter' or not is_approved:
+        return Counter()
+    department = department or ''
+    stats = Counter({(VOTERS, ''): 1, (DEPARTMENT_VOTERS, department): 1})
+    if has_voted:
+        stats.update({(VOTED, ''): 1, (DEPARTMENT_VOTED, department): 1})
+    return stats
+
+
+def vote_stats(position_ids):
+    """What Vote rows for these positions contribute to the totals"""
+    stats = Counter({(VOTES, ''): len(position_ids)})
+    stats.update((POSITION_VOTES, str(position_id)) for position_id in position_ids)
+    return stats
+
+
+def encrypted_vote_stats(count):
+    """What this many EncryptedVote rows contribute to the totals"""
+    return Counter({(ENCRYPTED_VOTES, ''): count})
+
+
+def add_to_stats(changes):
+    """Apply {(kind, key): delta} to the stats table, in the caller's transaction"""
+    changes = {stat: delta for stat, delta in changes.items() if delta}
+    if not changes:
+        return
+
+    rows = ElectionStat.objects.filter(
+        reduce(lambda q, stat: q | Q(kind=stat[0], key=stat[1]), changes, Q(pk__in=[]))
+    )
+    # Every existing row in one statement
+    updated = rows.update(value=F('value') + Case(
+        *[When(kind=kind, key=key, then=Value(delta)) for (kind, key), delta in changes.items()],
+        default=Value(0)
+    ))
+    if updated == len(changes):
+        return
+
+    existing = set(rows.values_list('kind', 'key'))
+    for (kind, key), delta in changes.items():
+        if (kind, key) in existing:
+            continue
+        try:
+            with transaction.atomic():
+                ElectionStat.objects.create(kind=kind, key=key, value=delta)
+        except IntegrityError:
+            # Another transaction created it first
+            ElectionStat.objects.filter(kind=kind, key=key).update(value=F('value') + delta)
+
+
+def election_stats():
+    """Turnout, per-position vote totals and per-department turnout, from one query"""
+    stats = defaultdict(dict)
+    for kind, key, value in ElectionStat.objects.values_list('kind', 'key', 'value'):
+        stats[kind][key] = value
+
+    total_voters = stats[VOTERS].get('', 0)
+    voted_count = stats[VOTED].get('', 0)
+    departments = []
+    for department in sorted(stats[DEPARTMENT_VOTERS].keys() | stats[DEPARTMENT_VOTED].keys()):
+        registered = stats[DEPARTMENT_VOTERS].get(department, 0)
+        voted = stats[DEPARTMENT_VOTED].get(department, 0)
+        if registered or voted:
+            departments.append({
+                'department': department or 'Unspecified',
+                'registered': registered,
+                'voted': voted,
+                'turnout': calculate_percentage(voted, registered),
+            })
+
+    return {
+        'total_voters': total_voters,
+        'voted_count': voted_count,
+        'turnout': round(voted_count / total_voters * 100) if total_voters else 0,
+        'total_votes': stats[VOTES].get('', 0),
+        'total_encrypted_votes': stats[ENCRYPTED_VOTES].get('', 0),
+        'position_votes': {int(key): value for key, value in stats[POSITION_VOTES].items()},
+        'departments': departments,
+    }
+
+
+@transaction.atomic
+def rebuild_election_stats():
+    """Recount every total from VoterProfile, Vote and EncryptedVote"""
+    from Voters.models import EncryptedVote, Vote, VoterProfile
+
+    totals = Counter()
+    voters = (
+        VoterProfile.objects.filter(category='Voter', is_approved=True)
+        .values('department').annotate(registered=Count('id'), voted=Count('id', filter=Q(has_voted=True)))
+        .order_by()
+    )
+    for row in voters:
+        department = row['department'] or ''
+        totals.update({
+            (VOTERS, ''): row['registered'], (DEPARTMENT_VOTERS, department): row['registered'],
+            (VOTED, ''): row['voted'], (DEPARTMENT_VOTED, department): row['voted'],
+        })
+    for position_id, votes in Vote.objects.values('position_id').annotate(votes=Count('id')).order_by().values_list('position_id', 'votes'):
+        totals.update({(VOTES, ''): votes, (POSITION_VOTES, str(position_id)): votes})
+    totals.update(encrypted_vote_stats(EncryptedVote.objects.count()))
+
+    ElectionStat.objects.all().delete()
+    ElectionStat.objects.bulk_create([
+        ElectionStat(kind=kind, key=key, value=value) for (kind, key), value in totals.items()
+    ])
+    return len(totals)
@@ -0,0 +1,197 @@
+import csv
+import io
+import os
+import zipfile
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from Voters.models import StudentRegistry
+from Voters.eligibility import bump_eligibility_version
+
+# openpyxl is only needed for .xlsx uploads
+XLSX_AVAILABLE = False
+
+try:
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+    XLSX_AVAILABLE = True
+except ImportError:
+    pass
+
+REQUIRED_COLUMNS = ['reg_number', 'full_name', 'email', 'department', 'year_of_study']
+UPDATE_FIELDS = ['full_name', 'email', 'department', 'year_of_study', 'is_active']
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+
+class StudentImportError(Exception):
+    """Raised when the file as a whole cannot be imported"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.processed = 0
+        self.errors = []  # (row number, message)
+
+    def __str__(self):
+        return (
+            f"{self.processed} rows processed: {self.created} created, "
+            f"{self.updated} updated, {len(self.errors)} errors"
+        )
+
+
+def _normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def iter_csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    row_number = 0
+    try:
+        header = [_normalize_header(h) for h in next(reader, [])]
+        row_number = 1
+        for row_number, values in enumerate(reader, start=2):
+            yield dict(zip(header, values))
+    except UnicodeDecodeError:
+        # Text is decoded ahead of the parser, so the bad byte is somewhere after the last good row
+        raise StudentImportError(
+            f'The file is not UTF-8 text (at or after row {row_number + 1}). '
+            'Save it as "CSV UTF-8" and import it again.'
+        )
+    except csv.Error as e:
+        raise StudentImportError(f'Row {row_number + 1}: {e}')
+
+
+def iter_xlsx_rows(file):
+    if not XLSX_AVAILABLE:
+        raise StudentImportError('XLSX import is not available. Please install openpyxl.')
+
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError):
+        raise StudentImportError(f"{getattr(file, 'name', 'The file')} is not a valid .xlsx workbook.")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_normalize_header(h) for h in next(rows, [])]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(file, filename):
+    """Yield one dict per data row, keyed by the normalized header names"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        rows = iter_csv_rows(file)
+    elif extension == '.xlsx':
+        rows = iter_xlsx_rows(file)
+    else:
+        raise StudentImportError('Unsupported file type. Upload a .csv or .xlsx file.')
+
+    first = next(rows, None)
+    if first is None:
+        return
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in first]
+    if missing:
+        raise StudentImportError(f"Missing column(s): {', '.join(missing)}")
+
+    yield first
+    yield from rows
+
+
+def _clean_row(row):
+    """Validate one row and return StudentRegistry field values"""
+    values = {name: str(row.get(name) or '').strip() for name in REQUIRED_COLUMNS}
+
+    for name, value in values.items():
+        if not value:
+            raise ValidationError(f'{name} is required')
+        max_length = StudentRegistry._meta.get_field(name).max_length
+        if max_length and len(value) > max_length:
+            raise ValidationError(f'{name} is longer than {max_length} characters')
+
+    validate_email(values['email'])
+
+    try:
+        values['year_of_study'] = int(float(values['year_of_study']))
+    except (ValueError, OverflowError):
+        raise ValidationError('year_of_study must be a number')
+    # Within what the database column can hold
+    StudentRegistry._meta.get_field('year_of_study').run_validators(values['year_of_study'])
+
+    is_active = str(row.get('is_active') or '').strip().lower()
+    values['is_active'] = is_active not in FALSE_VALUES
+
+    return values
+
+
+@transaction.atomic
+def _upsert_chunk(chunk, result):
+    existing = StudentRegistry.objects.in_bulk(list(chunk), field_name='reg_number')
+
+    to_create = []
+    to_update = []
+    for reg_number, values in chunk.items():
+        student = existing.get(reg_number)
+        if student is None:
+            to_create.append(StudentRegistry(**values))
+        else:
+            for field in UPDATE_FIELDS:
+                setattr(student, field, values[field])
+            to_update.append(student)
+
+    StudentRegistry.objects.bulk_create(to_create)
+    StudentRegistry.objects.bulk_update(to_update, UPDATE_FIELDS)
+
+    # Bulk writes skip model signals
+    bump_eligibility_version()
+
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def import_students(rows, chunk_size=1000, progress=None):
+    """Upsert StudentRegistry rows on reg_number, validating and writing in chunks.
+
+    ``progress`` is called with the ImportResult after every chunk. Rows that
+    fail validation are skipped and reported in ``result.errors``.
+    """
+    result = ImportResult()
+    seen = set()
+    chunk = {}
+
+    # Row 1 is the header
+    for row_number, row in enumerate(rows, start=2):
+        result.processed += 1
+
+        try:
+            values = _clean_row(row)
+        except ValidationError as e:
+            result.errors.append((row_number, '; '.join(e.messages)))
+            continue
+
+        reg_number = values['reg_number']
+        if reg_number in seen:
+            result.errors.append((row_number, f'Duplicate reg_number {reg_number} in file'))
+            continue
+        seen.add(reg_number)
+
+        chunk[reg_number] = values
+        if len(chunk) >= chunk_size:
+            _upsert_chunk(chunk, result)
+            chunk = {}
+            if progress:
+                progress(result)
+
+    if chunk:
+        _upsert_chunk(chunk, result)
+    if progress:
+        progress(result)
+
+    return result
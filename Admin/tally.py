@@ -0,0 +1,59 @@
+from django.db.models import Count
+
+from .models import Position, Candidate
+
+
+def calculate_percentage(vote_count, total_votes):
+    if total_votes == 0:
+        return 0
+    return round((vote_count / total_votes) * 100, 1)
+
+
+def candidate_vote_counts(**filters):
+    """Return {candidate_id: votes} for active candidates in one grouped query"""
+    candidates = Candidate.objects.filter(is_active=True, **filters)
+    return dict(
+        candidates.annotate(votes=Count('vote')).order_by().values_list('id', 'votes')
+    )
+
+
+def tally_results():
+    """Tally every active position.
+
+    Runs one query for the positions and one grouped aggregate for all
+    candidate counts, however many candidates are on the ballot. Each entry
+    has the shape the results page and PDF export expect:
+    {'position', 'candidates', 'total_votes'}, with every candidate carrying
+    ``vote_count`` and ``percentage``.
+    """
+    positions = list(Position.objects.filter(is_active=True))
+
+    candidates_by_position = {position.id: [] for position in positions}
+    candidates = Candidate.objects.filter(
+        is_active=True,
+        position__is_active=True
+    ).annotate(votes=Count('vote'))
+
+    for candidate in candidates:
+        candidate.vote_count = candidate.votes
+        candidates_by_position[candidate.position_id].append(candidate)
+
+    results_data = []
+    for position in positions:
+        candidates_data = candidates_by_position[position.id]
+        total_position_votes = sum(c.vote_count for c in candidates_data)
+
+        for candidate in candidates_data:
+            candidate.position = position
+            candidate.percentage = calculate_percentage(candidate.vote_count, total_position_votes)
+
+        # Sort by vote count (descending)
+        candidates_data.sort(key=lambda x: x.vote_count, reverse=True)
+
+        results_data.append({
+            'position': position,
+            'candidates': candidates_data,
+            'total_votes': total_position_votes
+        })
+
+    return results_data
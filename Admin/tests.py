@@ -0,0 +1,238 @@
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .counters import get_shard_count, increment_vote_count, rebuild_vote_counters, sync_vote_counts, vote_counts
+from .models import AuditLog, Candidate, ElectionStat, Position, VoteCounterShard
+from .pagination import decode_cursor, filter_query_string, paginate_keyset
+from .stats import POSITION_VOTES, VOTES, add_to_stats, election_stats, rebuild_election_stats
+from Voters.models import StudentRegistry, Vote, VoterProfile
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Rollback(Exception):
+    pass
+
+
+def inserted_first(insert):
+    """Run insert() just before the next transaction.atomic(), like a concurrent writer winning the race"""
+    atomic = transaction.atomic
+
+    def insert_then_atomic(*args, **kwargs):
+        insert()
+        return atomic(*args, **kwargs)
+
+    return mock.patch.object(transaction, 'atomic', side_effect=insert_then_atomic)
+
+
+@override_settings(AUDIT_LOG_SYNC_ACTIONS=['VOTE'])
+class SyncAuditLogTests(TestCase):
+    databases = {'default', 'audit'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('voter', password='pw')
+
+    def test_written_when_vote_transaction_commits(self):
+        with self.captureOnCommitCallbacks(using='default', execute=True):
+            with transaction.atomic():
+                AuditLog.log_action(user=self.user, action='VOTE', description='Ballot cast')
+                self.assertFalse(AuditLog.objects.exists())
+
+        self.assertEqual(list(AuditLog.objects.values_list('action', flat=True)), ['VOTE'])
+
+    def test_dropped_when_vote_transaction_rolls_back(self):
+        with self.captureOnCommitCallbacks(using='default', execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    AuditLog.log_action(user=self.user, action='VOTE', description='Ballot cast')
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(AuditLog.objects.exists())
+
+
+class ResultsPdfTests(TestCase):
+    databases = {'default', 'audit'}
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin', password='pw', is_staff=True))
+
+    @mock.patch('Admin.views.PDF_AVAILABLE', False)
+    def test_export_without_reportlab_redirects(self):
+        response = self.client.get(reverse('export_results_pdf'))
+
+        self.assertRedirects(response, reverse('results_view'), fetch_redirect_response=False)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ['PDF export is not available. Please install ReportLab.'],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VoteCounterTests(TestCase):
+    def setUp(self):
+        position = Position.objects.create(name='President')
+        self.alice = Candidate.objects.create(name='Alice', bio='', position=position)
+        self.bob = Candidate.objects.create(name='Bob', bio='', position=position)
+        self.voters = [
+            VoterProfile.objects.create(user=User.objects.create_user(f'voter{i}', password='pw'), reg_number=f'R{i}')
+            for i in range(3)
+        ]
+
+    def test_increment_spreads_over_shards(self):
+        for _ in range(20):
+            increment_vote_count(self.alice.id)
+        increment_vote_count(self.bob.id, 5)
+
+        self.assertEqual(vote_counts(), {self.alice.id: 20, self.bob.id: 5})
+        self.assertLessEqual(self.alice.counter_shards.count(), get_shard_count())
+
+    def test_increment_when_another_voter_creates_the_shard_first(self):
+        competitor = lambda: VoteCounterShard.objects.create(candidate=self.alice, shard=3, count=1)
+        with mock.patch('Admin.counters.random.randrange', return_value=3), inserted_first(competitor):
+            increment_vote_count(self.alice.id, 2)
+
+        self.assertEqual(vote_counts(), {self.alice.id: 3})
+        self.assertEqual(self.alice.counter_shards.count(), 1)
+
+    def test_sync_only_touches_given_candidates(self):
+        increment_vote_count(self.alice.id, 3)
+        increment_vote_count(self.bob.id, 4)
+
+        self.assertEqual(sync_vote_counts(Candidate.objects.filter(pk=self.alice.pk)), 1)
+        self.assertEqual(sync_vote_counts(Candidate.objects.filter(pk=self.alice.pk)), 0)
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.vote_count, self.bob.vote_count), (3, 0))
+
+        self.assertEqual(sync_vote_counts(), 1)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.vote_count, 4)
+
+    def test_rebuild_recounts_from_votes(self):
+        for voter, candidate in zip(self.voters, [self.alice, self.alice, self.bob]):
+            Vote.objects.create(voter=voter, candidate=candidate, position_id=candidate.position_id)
+        # Drifted shards, including one for a candidate with no votes left
+        increment_vote_count(self.alice.id, 10)
+        Candidate.objects.filter(pk=self.bob.pk).update(vote_count=7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_vote_counters()
+
+        self.assertEqual(vote_counts(), {self.alice.id: 2, self.bob.id: 1})
+        self.assertEqual(
+            dict(Candidate.objects.values_list('id', 'vote_count')), {self.alice.id: 2, self.bob.id: 1}
+        )
+
+
+class ElectionStatTests(TestCase):
+    def setUp(self):
+        # Migrations seed some totals
+        ElectionStat.objects.all().delete()
+
+    def values(self):
+        return {
+            (kind, key): value
+            for kind, key, value in ElectionStat.objects.exclude(value=0).values_list('kind', 'key', 'value')
+        }
+
+    def test_add_to_stats_creates_and_updates_rows(self):
+        add_to_stats(Counter({(VOTES, ''): 2, (POSITION_VOTES, '1'): 2}))
+        add_to_stats(Counter({(VOTES, ''): 1, (POSITION_VOTES, '2'): 1}))
+
+        changes = Counter({(POSITION_VOTES, '1'): 0})
+        changes.subtract({(VOTES, ''): 1})
+        add_to_stats(changes)
+
+        self.assertEqual(self.values(), {(VOTES, ''): 2, (POSITION_VOTES, '1'): 2, (POSITION_VOTES, '2'): 1})
+
+    def test_add_to_stats_without_changes_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            add_to_stats(Counter({(VOTES, ''): 0}))
+
+    def test_add_to_stats_when_another_transaction_creates_the_row_first(self):
+        with inserted_first(lambda: ElectionStat.objects.create(kind=VOTES, key='', value=5)):
+            add_to_stats(Counter({(VOTES, ''): 2}))
+
+        self.assertEqual(self.values(), {(VOTES, ''): 7})
+
+    def test_voter_profiles_keep_turnout_in_step(self):
+        profiles = [
+            VoterProfile.objects.create(
+                user=User.objects.create_user(f'voter{i}', password='pw'), reg_number=f'R{i}', department='Physics'
+            )
+            for i in range(3)
+        ]
+        VoterProfile.objects.create(user=User.objects.create_user('admin', password='pw'), category='Admin')
+        profiles[0].has_voted = True
+        profiles[0].save()
+        profiles[1].is_approved = False
+        profiles[1].save()
+
+        stats = election_stats()
+        self.assertEqual((stats['total_voters'], stats['voted_count']), (2, 1))
+        self.assertEqual(stats['departments'], [{'department': 'Physics', 'registered': 2, 'voted': 1, 'turnout': 50.0}])
+
+        expected = self.values()
+        rebuild_election_stats()
+        self.assertEqual(self.values(), expected)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        StudentRegistry.objects.bulk_create([
+            StudentRegistry(reg_number=f'R{i:02}', full_name=f'Student {i}', email=f's{i}@example.com',
+                            department='Physics', year_of_study=1)
+            for i in range(12)
+        ])
+        # Pairs of rows share a timestamp, so the id has to break ties
+        start = timezone.now()
+        for i, student in enumerate(StudentRegistry.objects.order_by('id')):
+            StudentRegistry.objects.filter(pk=student.pk).update(created_at=start + timedelta(minutes=i // 2))
+        self.newest_first = list(StudentRegistry.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def page(self, **kwargs):
+        return paginate_keyset(StudentRegistry.objects.all(), 'created_at', per_page=5, **kwargs)
+
+    def ids(self, page):
+        return [student.id for student in page]
+
+    def test_walks_forward_and_back(self):
+        first = self.page()
+        second = self.page(after=first.next_cursor)
+        third = self.page(after=second.next_cursor)
+
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), self.newest_first)
+        self.assertIsNone(first.previous_cursor)
+        self.assertIsNone(third.next_cursor)
+        self.assertEqual(len(third), 2)
+
+        self.assertEqual(self.ids(self.page(before=third.previous_cursor)), self.ids(second))
+        back_to_first = self.page(before=second.previous_cursor)
+        self.assertEqual(self.ids(back_to_first), self.ids(first))
+        self.assertIsNone(back_to_first.previous_cursor)
+        self.assertEqual(back_to_first.next_cursor, first.next_cursor)
+
+    def test_malformed_cursor_starts_from_the_first_page(self):
+        self.assertIsNone(decode_cursor('not a cursor'))
+        self.assertEqual(self.ids(self.page(after='not a cursor')), self.newest_first[:5])
+
+    def test_single_page(self):
+        page = paginate_keyset(StudentRegistry.objects.all(), 'created_at', per_page=20)
+        self.assertEqual(self.ids(page), self.newest_first)
+        self.assertFalse(page.has_other_pages)
+
+    def test_query_string_drops_cursors(self):
+        request = RequestFactory().get('/', {'department': 'Physics', 'after': 'x', 'before': 'y'})
+        self.assertEqual(filter_query_string(request), 'department=Physics')
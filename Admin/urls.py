@@ -12,7 +12,14 @@ urlpatterns = [
     path('delete-candidate/<int:candidate_id>/', views.delete_candidate, name='delete_candidate'),
     path('results/', views.results_view, name='results_view'),
     path('results/export/pdf/', views.export_results_pdf, name='export_results_pdf'),
+    path('export/<slug:dataset>.<slug:fmt>', views.export_data, name='export_data'),
+    path('results/verify/', views.verify_ballots, name='verify_ballots'),
+    path('results/merkle/root/', views.merkle_root, name='merkle_root'),
+    path('results/merkle/proof/<int:index>/', views.merkle_proof, name='merkle_proof'),
+    path('results/stream/', views.results_stream, name='results_stream'),
     path('audit-logs/', views.audit_logs, name='audit_logs'),
+    path('performance/', views.performance_view, name='admin_performance'),
     path('settings/', views.election_settings, name='election_settings'),
     path('manage-students/', views.manage_students, name='admin_manage_students'),
+    path('manage-students/import/', views.import_students, name='admin_import_students'),
 ]
@@ -1,46 +1,61 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.conf import settings
 from django.db.models import Count, Sum
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils._os import safe_join
+from django.core.exceptions import SuspiciousFileOperation
 from datetime import datetime
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from io import BytesIO
+import os
 
 from .models import Position, Candidate, ElectionSettings, AuditLog
-from .forms import PositionForm, CandidateForm, ElectionSettingsForm, AdminRegistrationForm, StudentRegistryForm
-from Voters.models import VoterProfile, Vote, EncryptedVote, StudentRegistry
-
-# ReportLab for PDF generation
-PDF_AVAILABLE = False
-reportlab_pdf = None
-
-try:
-    from reportlab.pdfgen import canvas
-    reportlab_pdf = canvas
-    PDF_AVAILABLE = True
-except ImportError:
-    pass
+from .tally import tally_results
+from .stats import election_stats
+from .counters import vote_counts
+from .exports import EXPORT_COLUMNS, EXPORT_FORMATS, audit_log_rows, results_rows, turnout_rows
+from .photos import PROCESSED_NAME, UPLOAD_DIR
+from .reports import PDF_AVAILABLE, open_results_pdf, results_version
+from .live_results import format_event, get_broadcaster, read_results
+from .audit import flush_audit_log
+from .forms import PositionForm, CandidateForm, ElectionSettingsForm, AdminRegistrationForm, StudentRegistryForm, StudentImportForm, AuditLogFilterForm, StudentFilterForm
+from .pagination import paginate_keyset, filter_query_string
+from .instrumentation import LATENCY_BUCKETS_MS, collect_stats
+from .student_import import StudentImportError, import_students as run_student_import, iter_rows
+from Voters.models import StudentRegistry
+from Voters.middleware import get_voter_profile
+from Voters.ballot_verification import verify_ballots as run_ballot_verification
+from Voters.merkle import inclusion_proof, tree_head, verify_tree
+
+AUDIT_LOGS_PER_PAGE = 50
+STUDENTS_PER_PAGE = 50
 
 def is_admin(user):
-    if not user.is_authenticated:
-        return False
-    try:
-        profile = VoterProfile.objects.get(user=user)
-        return profile.category == 'Admin' and profile.is_approved
-    except VoterProfile.DoesNotExist:
-        return user.is_staff or user.is_superuser
+    profile = get_voter_profile(user)
+    if profile is None:
+        return user.is_authenticated and (user.is_staff or user.is_superuser)
+    return profile.category == 'Admin' and profile.is_approved
 
 @login_required
 @user_passes_test(is_admin)
 def manage_students(request):
-    students = StudentRegistry.objects.all().order_by('-created_at')
+    students = StudentRegistry.objects.all()
+    filter_form = StudentFilterForm(request.GET)
+    if filter_form.is_valid():
+        students = filter_form.filter_queryset(students)
+    students = paginate_keyset(
+        students,
+        'created_at',
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=STUDENTS_PER_PAGE
+    )
     form = StudentRegistryForm()
 
     if request.method == 'POST':
@@ -63,10 +78,50 @@ def manage_students(request):
 
     context = {
         'students': students,
-        'form': form
+        'form': form,
+        'import_form': StudentImportForm(),
+        'filter_form': filter_form,
+        'filter_query': filter_query_string(request)
     }
     return render(request, 'admin/manage_students.html', context)
 
+# Maximum number of per-row errors echoed back to the admin
+IMPORT_ERRORS_SHOWN = 20
+
+@login_required
+@user_passes_test(is_admin)
+def import_students(request):
+    if request.method != 'POST':
+        return redirect('admin_manage_students')
+
+    form = StudentImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        messages.error(request, 'Please choose a CSV or XLSX file to import.')
+        return redirect('admin_manage_students')
+
+    upload = form.cleaned_data['file']
+    try:
+        result = run_student_import(iter_rows(upload, upload.name))
+    except StudentImportError as e:
+        messages.error(request, str(e))
+        return redirect('admin_manage_students')
+
+    # One summary entry for the whole file
+    AuditLog.log_action(
+        user=request.user,
+        action='ADMIN_ACTION',
+        description=f"Imported student registry from {upload.name}: {result}",
+        request=request
+    )
+
+    messages.success(request, f'Import finished. {result}.')
+    for row_number, message in result.errors[:IMPORT_ERRORS_SHOWN]:
+        messages.warning(request, f'Row {row_number}: {message}')
+    if len(result.errors) > IMPORT_ERRORS_SHOWN:
+        messages.warning(request, f'...and {len(result.errors) - IMPORT_ERRORS_SHOWN} more row errors.')
+
+    return redirect('admin_manage_students')
+
 def admin_register(request):
     if request.method == 'POST':
         form = AdminRegistrationForm(request.POST)
@@ -91,45 +146,43 @@ def admin_register(request):
 @login_required
 @user_passes_test(is_admin)
 def admin_dashboard(request):
-    positions = Position.objects.filter(is_active=True)
-    candidates = Candidate.objects.select_related('position').all()  # Removed is_active filter to see all candidates
-    voters = VoterProfile.objects.filter(category='Voter', is_approved=True)
-    votes = Vote.objects.all()
-    encrypted_votes = EncryptedVote.objects.all()
+    positions = list(Position.objects.filter(is_active=True))
+    candidates = list(Candidate.objects.select_related('position').all())  # Removed is_active filter to see all candidates
     
     # Election settings
     election_settings = ElectionSettings.get_current()
     
-    # Statistics
-    total_voters = voters.count()
-    voted_count = voters.filter(has_voted=True).count()
-    total_votes = votes.count()
-    total_encrypted_votes = encrypted_votes.count()
+    # Statistics, kept up to date as votes come in (see Admin/stats.py)
+    stats = election_stats()
+    
+    # Live counts from the counter shards (vote_count is only synced on reconcile)
+    live_counts = vote_counts()
+    for candidate in candidates:
+        candidate.vote_count = live_counts.get(candidate.id, 0)
     
     # Recent audit logs
-    recent_logs = AuditLog.objects.all()[:10]
+    flush_audit_log()
+    recent_logs = AuditLog.objects.prefetch_related('user')[:10]
     
     # Vote statistics by position
-    vote_stats = []
-    for position in positions:
-        # Use Candidate model's reverse lookup instead of position.candidates
-        position_candidates = Candidate.objects.filter(position=position, is_active=True)
-        position_votes = Vote.objects.filter(candidate__in=position_candidates)
-        vote_stats.append({
+    vote_stats = [
+        {
             'position': position,
-            'candidates': position_candidates,
-            'total_votes': position_votes.count()
-        })
-    
-    
+            'candidates': [c for c in candidates if c.position_id == position.id and c.is_active],
+            'total_votes': stats['position_votes'].get(position.id, 0)
+        }
+        for position in positions
+    ]
     
     context = {
         'positions': positions,
         'candidates': candidates,
-        'total_voters': total_voters,
-        'voted_count': voted_count,
-        'total_votes': total_votes,
-        'total_encrypted_votes': total_encrypted_votes,
+        'total_voters': stats['total_voters'],
+        'voted_count': stats['voted_count'],
+        'turnout': stats['turnout'],
+        'total_votes': stats['total_votes'],
+        'total_encrypted_votes': stats['total_encrypted_votes'],
+        'department_turnout': stats['departments'],
         'vote_stats': vote_stats,
         'recent_logs': recent_logs,
         'election_settings': election_settings,
@@ -295,160 +348,206 @@ def results_view(request):
         messages.warning(request, 'Results are not yet published.')
         return redirect('admin_dashboard')
     
-    positions = Position.objects.filter(is_active=True).prefetch_related('candidates')
-    
-    results_data = []
-    for position in positions:
-        # Get candidates through the reverse relationship
-        candidates_data = []
-        total_position_votes = 0
-        
-        # Use Candidate model's reverse lookup instead of position.candidates
-        position_candidates = Candidate.objects.filter(position=position, is_active=True)
-        for candidate in position_candidates:
-            vote_count = Vote.objects.filter(candidate=candidate).count()
-            candidate.vote_count = vote_count
-            total_position_votes += vote_count
-            candidates_data.append(candidate)
-        
-        # Calculate percentages
-        for candidate in candidates_data:
-            if total_position_votes > 0:
-                candidate.percentage = round((candidate.vote_count / total_position_votes) * 100, 1)
-            else:
-                candidate.percentage = 0
-        
-        # Sort by vote count (descending)
-        candidates_data.sort(key=lambda x: x.vote_count, reverse=True)
-        
-        results_data.append({
-            'position': position,
-            'candidates': candidates_data,
-            'total_votes': total_position_votes
-        })
+    results_data = tally_results()
+    stats = election_stats()
     
     context = {
         'results_data': results_data,
-        'total_voters': VoterProfile.objects.filter(category='Voter', is_approved=True).count(),
-        'voted_count': VoterProfile.objects.filter(category='Voter', has_voted=True).count(),
+        'total_voters': stats['total_voters'],
+        'voted_count': stats['voted_count'],
         'election_settings': election_settings,
+        'pdf_available': PDF_AVAILABLE,
     }
     
     return render(request, 'admin/results.html', context)
 
-import io
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-
 @login_required
 @user_passes_test(is_admin)
 def export_results_pdf(request):
-    # Ensure ReportLab is available
-    try:
-        from reportlab.pdfgen import canvas
-    except ImportError:
+    if not PDF_AVAILABLE:
         messages.error(request, 'PDF export is not available. Please install ReportLab.')
         return redirect('results_view')
     
     election_settings = ElectionSettings.get_current()
-    positions = Position.objects.filter(is_active=True).prefetch_related('candidates')
-
-    results_data = []
-    total_all_votes = 0
-
-    for position in positions:
-        candidates_data = []
-        total_position_votes = 0
-
-        position_candidates = Candidate.objects.filter(position=position, is_active=True)
-        for candidate in position_candidates:
-            vote_count = Vote.objects.filter(candidate=candidate).count()
-            candidate.vote_count = vote_count
-            total_position_votes += vote_count
-            candidates_data.append(candidate)
-
-        for candidate in candidates_data:
-            if total_position_votes > 0:
-                candidate.percentage = round((candidate.vote_count / total_position_votes) * 100, 1)
-            else:
-                candidate.percentage = 0
-
-        candidates_data.sort(key=lambda x: x.vote_count, reverse=True)
-
-        results_data.append({
-            'position': position,
-            'candidates': candidates_data,
-            'total_votes': total_position_votes
-        })
-
-        total_all_votes += total_position_votes
-
-    total_voters = VoterProfile.objects.filter(category='Voter', is_approved=True).count()
-    voted_count = VoterProfile.objects.filter(category='Voter', has_voted=True).count()
-
-    # --- Generate PDF using ReportLab ---
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    x_margin = 1 * inch
-    y = height - 1 * inch
-    line_height = 14
-
-    def draw_line(text, font_size=12):
-        nonlocal y
-        if y <= 1 * inch:
-            p.showPage()
-            y = height - 1 * inch
-        p.setFont("Helvetica", font_size)
-        p.drawString(x_margin, y, text)
-        y -= line_height
-
-    # PDF Title
-    draw_line("Election Results Report", 14)
-    draw_line(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    draw_line(f"Admin: {request.user.get_full_name() or request.user.username}")
-    draw_line("")
-
-    draw_line(f"Total Registered Voters: {total_voters}")
-    draw_line(f"Total Voted: {voted_count}")
-    draw_line(f"Total Votes Counted: {total_all_votes}")
-    draw_line("")
-
-    for item in results_data:
-        draw_line(f"Position: {item['position'].name}", 13)
-        draw_line(f"Total Votes for this Position: {item['total_votes']}")
-        for candidate in item['candidates']:
-            draw_line(f" - {candidate.name}: {candidate.vote_count} votes ({candidate.percentage}%)")
-        draw_line("")
-
-    # Finalize PDF
-    p.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-
-    # Audit log
+    version = results_version(election_settings)
+    
+    # Audit log, whether or not the browser already has this version
     AuditLog.log_action(
         user=request.user,
         action='PDF_EXPORT',
         description="Election results exported to PDF",
         request=request
     )
+    
+    not_modified = get_conditional_response(request, etag=f'"{version}"')
+    if not_modified:
+        return not_modified
+    
+    response = FileResponse(
+        open_results_pdf(version),
+        as_attachment=True,
+        filename=f'election_results_{version}.pdf',
+        content_type='application/pdf'
+    )
+    response['ETag'] = f'"{version}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-    response = HttpResponse(pdf, content_type='application/pdf')
-    filename = f'election_results_{timezone.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+@login_required
+@user_passes_test(is_admin)
+def export_data(request, dataset, fmt):
+    """Stream results, audit logs or turnout as CSV or JSON Lines"""
+    if dataset not in EXPORT_COLUMNS or fmt not in EXPORT_FORMATS:
+        raise Http404('Unknown export')
+    
+    if dataset == 'audit-logs':
+        flush_audit_log()
+        logs = AuditLog.objects.all()
+        filter_form = AuditLogFilterForm(request.GET)
+        if filter_form.is_valid():
+            logs = filter_form.filter_queryset(logs)
+        rows = audit_log_rows(logs)
+    elif dataset == 'results':
+        rows = results_rows()
+    else:
+        rows = turnout_rows()
+    
+    # Log the action
+    AuditLog.log_action(
+        user=request.user,
+        action='ADMIN_ACTION',
+        description=f"Exported {dataset} as {fmt.upper()}",
+        request=request
+    )
+    
+    stream, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(stream(EXPORT_COLUMNS[dataset], rows), content_type=content_type)
+    filename = f'{dataset}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{fmt}'
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
     return response
 
 @login_required
 @user_passes_test(is_admin)
 def audit_logs(request):
-    logs = AuditLog.objects.all()[:100]  # Last 100 logs
-    return render(request, 'admin/audit_logs.html', {'logs': logs})
+    flush_audit_log()
+    # Users live in the main database, so fetch them in a second query rather than a join
+    logs = AuditLog.objects.prefetch_related('user__voterprofile')
+    filter_form = AuditLogFilterForm(request.GET)
+    if filter_form.is_valid():
+        logs = filter_form.filter_queryset(logs)
+    logs = paginate_keyset(
+        logs,
+        'timestamp',
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=AUDIT_LOGS_PER_PAGE
+    )
+    return render(request, 'admin/audit_logs.html', {
+        'logs': logs,
+        'filter_form': filter_form,
+        'filter_query': filter_query_string(request)
+    })
+
+@login_required
+@user_passes_test(is_admin)
+def verify_ballots(request):
+    result = None
+    tree_result = None
+    
+    if request.method == 'POST':
+        # In this process: forking a pool from a web worker would copy its threads and connections
+        result = run_ballot_verification(workers=0)
+        tree_result = verify_tree()
+        
+        # Log the action
+        AuditLog.log_action(
+            user=request.user,
+            action='ADMIN_ACTION',
+            description=(f"Ballot verification: {result.ballots} ballots verified, "
+                         f"{result.failure_count} failed to decrypt, "
+                         f"{len(result.mismatches)} candidate count mismatches, "
+                         f"hash tree {'matches' if tree_result.ok else 'does not match'}"),
+            request=request
+        )
+        
+        if result.ok and tree_result.ok:
+            messages.success(request, f'All {result.ballots} encrypted ballots verified and the counts match.')
+        else:
+            messages.error(request, 'Ballot verification found problems. See the details below.')
+    
+    return render(request, 'admin/verify_ballots.html', {
+        'result': result,
+        'tree_result': tree_result,
+        'tree_head': tree_head(),
+    })
+
+@login_required
+@user_passes_test(is_admin)
+def merkle_root(request):
+    """Current size and root of the ballot hash tree"""
+    return JsonResponse(tree_head())
+
+@login_required
+@user_passes_test(is_admin)
+def merkle_proof(request, index):
+    """Inclusion proof for one ballot leaf, against the current tree or ?size=N"""
+    size = request.GET.get('size')
+    proof = inclusion_proof(index, int(size) if size and size.isdigit() else None)
+    if proof is None:
+        raise Http404('No such leaf in that tree')
+    return JsonResponse(proof)
+
+def candidate_photo(request, path):
+    """Serve candidate photos; processed ones are content-hashed and cached for a year"""
+    upload_root = os.path.realpath(os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR))
+    try:
+        full_path = safe_join(upload_root, path)
+    except SuspiciousFileOperation:
+        raise Http404('Photo not found')
+    # Symlinks must not lead out of the upload directory either
+    if os.path.commonpath([upload_root, os.path.realpath(full_path)]) != upload_root or not os.path.isfile(full_path):
+        raise Http404('Photo not found')
+    
+    response = FileResponse(open(full_path, 'rb'))
+    if PROCESSED_NAME.match(os.path.basename(path)):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        # Uploaded before processing; the file behind the name can change
+        response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+@login_required
+@user_passes_test(is_admin)
+async def results_stream(request):
+    """Server-Sent Events feed of vote counts and turnout for the admin dashboard"""
+    # A WSGI worker can't hold the connection open; send one snapshot and let the browser
+    # poll again later. read_results() is cached, so each poll costs only the auth queries.
+    if not isinstance(request, ASGIRequest):
+        results = await sync_to_async(read_results)()
+        retry = f"retry: {int(settings.RESULTS_STREAM_WSGI_RETRY * 1000)}\n\n"
+        response = HttpResponse(retry + format_event('snapshot', results), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+    
+    async def events():
+        yield f"retry: {int(settings.RESULTS_STREAM_INTERVAL * 1000)}\n\n"
+        async for event in get_broadcaster().stream(settings.RESULTS_STREAM_KEEPALIVE):
+            yield event
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@user_passes_test(is_admin)
+def performance_view(request):
+    return render(request, 'admin/performance.html', {
+        'enabled': settings.PERF_INSTRUMENTATION,
+        'stats': collect_stats(),
+        'buckets': LATENCY_BUCKETS_MS,
+        'window_minutes': settings.PERF_WINDOW_SECONDS * settings.PERF_WINDOWS // 60,
+    })
 
 @login_required
 @user_passes_test(is_admin)
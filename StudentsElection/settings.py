@@ -30,6 +30,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-(%6mr75^+hp9-vclwu+@15=^ef!-*2o5q7vzgveq=3f&-tuoy9'
 VOTE_ENCRYPTION_KEY = "Zs3iVPv3bqsmNITZ_Vd0xQdWObaA3zFqvOBbd3N7MUI="
 
+# Number of counter rows each candidate's votes are spread across
+VOTE_COUNTER_SHARDS = 8
+
+# Processes `manage.py verify_ballots` decrypts with (None = one per CPU); the web page uses none
+BALLOT_VERIFY_WORKERS = None
+
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -53,11 +59,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'Admin.instrumentation.PerformanceMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Voters.middleware.VoterProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,13 +93,136 @@ WSGI_APPLICATION = 'StudentsElection.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite write-path profile, applied to every new connection:
+# - WAL lets readers carry on while a vote is being written
+# - synchronous=NORMAL is crash-safe under WAL and skips an fsync per commit
+# - write transactions take the lock at BEGIN (IMMEDIATE) and wait up to
+#   `timeout` seconds for it instead of failing with "database is locked"
+# - connections are reused across requests instead of reopened every time
+SQLITE_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=134217728;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Audit trail in its own file so its writes don't queue behind ballots.
+    # Create it with: python manage.py migrate --database=audit
+    'audit': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'audit.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+DATABASE_ROUTERS = ['Admin.routers.AuditRouter']
+
+# Models stored in the audit database. Sessions live there too, so logins
+# and session saves never wait on the vote database's write lock.
+AUDIT_DATABASE_MODELS = ['Admin.AuditLog', 'sessions.Session']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# File based so every gunicorn worker on the host shares the same entries
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
     }
 }
 
+# Safety net for changes made outside the ORM; saves and deletes clear it immediately
+ELECTION_SETTINGS_CACHE_TIMEOUT = 300
+
+# Ballot snapshots are keyed by version, so old ones only need to expire eventually
+BALLOT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Sessions
+# Stored in the database, which AUDIT_DATABASE_MODELS routes to the audit
+# file: one primary-key read per request, durable across cache clears and
+# restarts, and off the vote database. Remove expired rows with
+# `python manage.py clearsessions` (e.g. nightly). A file cache is not used
+# here because FileBasedCache lists its whole directory on every write.
+# Alternatives, compared by benchmarks/session_engines.py:
+#   'django.contrib.sessions.backends.cached_db'       database plus the default cache
+#   'django.contrib.sessions.backends.signed_cookies'  no server-side storage,
+#       but a logout cannot revoke a copied cookie
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+
+# Live results
+# Each worker polls the vote counters at most once per interval and pushes
+# the changes to every admin dashboard it is streaming to. Streams stay open
+# only under an ASGI server (e.g. uvicorn StudentsElection.asgi:application).
+# Under WSGI (gunicorn's default sync workers) each connection gets one
+# snapshot and the browser polls again after RESULTS_STREAM_WSGI_RETRY, so
+# a room full of open dashboards stays a trickle of cheap requests.
+
+RESULTS_STREAM_INTERVAL = 2  # seconds
+RESULTS_STREAM_KEEPALIVE = 15  # seconds
+RESULTS_STREAM_WSGI_RETRY = 30  # seconds
+
+# Results PDFs are built once per results version and served from here
+RESULTS_REPORT_DIR = BASE_DIR / 'reports'
+
+
+# Vote intake
+# With VOTE_INTAKE_JOURNAL on, vote_confirm and submit_ballot append each
+# validated ballot to an fsync'd journal in VOTE_JOURNAL_DIR and answer the
+# voter straight away. A single `python manage.py apply_vote_journal`
+# process writes them to the database in batches of VOTE_JOURNAL_BATCH_SIZE.
+
+VOTE_INTAKE_JOURNAL = False
+VOTE_JOURNAL_DIR = BASE_DIR / 'journal'
+VOTE_JOURNAL_BATCH_SIZE = 500
+VOTE_JOURNAL_POLL_INTERVAL = 0.5  # seconds
+
+
+# Audit log
+# Entries are queued in memory and written in batches off the request path.
+# Actions listed in AUDIT_LOG_SYNC_ACTIONS (e.g. 'VOTE') skip the queue and
+# are written as soon as the caller's transaction on the vote database
+# commits (at once outside a transaction). The audit database is separate,
+# so the entry cannot share that transaction; a rollback simply drops it.
+
+AUDIT_LOG_BUFFERED = True
+AUDIT_LOG_BATCH_SIZE = 100
+AUDIT_LOG_FLUSH_INTERVAL = 2  # seconds
+AUDIT_LOG_SYNC_ACTIONS = []
+
+
+# Request instrumentation
+# Opt-in timing, query counts and duplicate-query detection per URL name,
+# shown on the admin performance page and logged by each worker.
+
+PERF_INSTRUMENTATION = False
+PERF_WINDOW_SECONDS = 60
+PERF_WINDOWS = 15  # keep the last 15 minutes
+PERF_PUBLISH_INTERVAL = 10  # seconds
+PERF_DUPLICATE_QUERY_THRESHOLD = 3
+
+
+# Username or registration number in one query, see Voters/backends.py
+AUTHENTICATION_BACKENDS = [
+    'Voters.backends.UsernameOrRegNumberBackend',
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,6 +265,10 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Uploaded files (candidate photos under media/candidates/), kept apart from the code
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 STORAGES = {
     "default": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
+from Admin.views import candidate_photo
+
 handler404 = 'Voters.views.custom_404'
 
 urlpatterns = [
@@ -11,8 +13,8 @@ urlpatterns = [
     path('', RedirectView.as_view(url='/login/', permanent=False)),
     path('', include('Voters.urls')),
     path('admin/', include('Admin.urls')),
+    path('media/candidates/<path:path>', candidate_photo, name='candidate_photo'),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
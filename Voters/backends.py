@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .models import VoterProfile
+
+UserModel = get_user_model()
+
+
+class UsernameOrRegNumberBackend(ModelBackend):
+    """Log in with a username, or a registration number when category is 'Voter'.
+
+    Each lookup is a single indexed query that also loads the other side of
+    the user/VoterProfile pair, so user.voterprofile (and get_voter_profile)
+    is already loaded afterwards. A username match wins over a registration
+    number match, as it did when the view tried them in turn, and the
+    password is hashed once either way.
+    """
+
+    def authenticate(self, request, username=None, password=None, category=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        # Two lookups rather than one OR across the join, which SQLite can
+        # only answer by scanning auth_user
+        user = UserModel._default_manager.select_related('voterprofile').filter(username=username).first()
+        if user is None and category == 'Voter':
+            profile = VoterProfile.objects.select_related('user').filter(reg_number=username).first()
+            user = profile.user if profile else None
+
+        if user is None:
+            # Same hashing cost as a real check, so unknown names take as long
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,158 @@
+"""Independent tally of the encrypted ballots.
+
+Decrypts every EncryptedVote, across a process pool or in the calling
+process, and checks the result against the Vote table and the vote counter
+shards. Worker processes only need the stdlib and .crypto, so the functions
+they run do not touch Django.
+"""
+
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .crypto import derive_key, decrypt_vote_data
+
+# Failed ballot ids kept in the report
+MAX_REPORTED_FAILURES = 100
+
+_worker_key = None
+
+
+def _init_worker(secret):
+    # Derive the AES key once per worker process, not once per ballot
+    global _worker_key
+    _worker_key = derive_key(secret)
+
+
+def _decrypt_chunk(rows):
+    """Tally one chunk of (id, position_id, encrypted_vote_data) rows"""
+    counts = Counter()
+    failures = []
+    for ballot_id, position_id, encrypted_vote_data in rows:
+        try:
+            vote = decrypt_vote_data(encrypted_vote_data, _worker_key)
+        except Exception:
+            failures.append(ballot_id)
+            continue
+
+        if vote.get('position_id') != position_id:
+            failures.append(ballot_id)
+            continue
+        counts[vote['candidate_id']] += 1
+    return counts, failures
+
+
+class BallotVerification:
+    def __init__(self):
+        self.ballots = 0
+        self.tally = Counter()
+        self.failed_ids = []
+        self.failure_count = 0
+        self.rows = []  # one dict per candidate
+
+    @property
+    def mismatches(self):
+        return [row for row in self.rows if not row['matches']]
+
+    @property
+    def ok(self):
+        return self.failure_count == 0 and not self.mismatches
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def verify_ballots(chunk_size=2000, workers=None, progress=None):
+    """Decrypt and tally every encrypted ballot, then cross-check the counts.
+
+    Rows are streamed from the database in chunks and at most two chunks per
+    worker are in flight, so memory stays flat however many ballots there
+    are. ``workers=0`` decrypts in this process instead of forking a pool,
+    which is what web requests must do. ``progress`` is called with the
+    number of ballots processed so far.
+    """
+    from django.conf import settings
+    from django.db.models import Count
+    from Admin.counters import vote_counts
+    from Admin.models import Candidate
+    from .models import EncryptedVote
+
+    if workers is None:
+        workers = settings.BALLOT_VERIFY_WORKERS or os.cpu_count()
+    result = BallotVerification()
+
+    rows = (
+        EncryptedVote.objects.order_by('id')
+        .values_list('id', 'position_id', 'encrypted_vote_data')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    def collect(counts, failures):
+        result.tally.update(counts)
+        result.failure_count += len(failures)
+        result.failed_ids.extend(failures[:MAX_REPORTED_FAILURES - len(result.failed_ids)])
+
+    if not workers:
+        _init_worker(settings.VOTE_ENCRYPTION_KEY)
+        for chunk in _chunks(rows, chunk_size):
+            collect(*_decrypt_chunk(chunk))
+            result.ballots += len(chunk)
+            if progress:
+                progress(result.ballots)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(settings.VOTE_ENCRYPTION_KEY,)) as executor:
+            pending = set()
+            for chunk in _chunks(rows, chunk_size):
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(*future.result())
+
+                pending.add(executor.submit(_decrypt_chunk, chunk))
+                result.ballots += len(chunk)
+                if progress:
+                    progress(result.ballots)
+
+            for future in pending:
+                collect(*future.result())
+
+    counters = vote_counts()
+    candidates = Candidate.objects.select_related('position').annotate(votes=Count('vote'))
+    for candidate in candidates:
+        counts = {
+            'encrypted': result.tally.get(candidate.id, 0),
+            'votes': candidate.votes,
+            'counters': counters.get(candidate.id, 0),
+        }
+        # vote_count is shown for reference only; it lags until the next reconcile
+        result.rows.append(dict(
+            counts,
+            vote_count=candidate.vote_count,
+            candidate_id=candidate.id,
+            candidate=candidate,
+            matches=len(set(counts.values())) == 1
+        ))
+
+    # Ballots naming a candidate that no longer exists
+    known = {row['candidate_id'] for row in result.rows}
+    for candidate_id in sorted(set(result.tally) - known):
+        result.rows.append({
+            'candidate_id': candidate_id,
+            'candidate': None,
+            'encrypted': result.tally[candidate_id],
+            'votes': 0,
+            'counters': counters.get(candidate_id, 0),
+            'vote_count': 0,
+            'matches': False,
+        })
+
+    return result
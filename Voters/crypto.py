@@ -0,0 +1,44 @@
+"""Vote encryption helpers.
+
+Kept free of Django imports so ballot verification can run them in
+worker processes without setting up the project.
+"""
+
+import hashlib
+import json
+from base64 import b64encode, b64decode
+from functools import lru_cache
+
+from Crypto.Cipher import AES
+
+
+@lru_cache(maxsize=None)
+def derive_key(secret):
+    return hashlib.sha256(secret.encode()).digest()  # 32-byte key
+
+
+def encrypt_vote_data(vote_data, key):
+    cipher = AES.new(key, AES.MODE_EAX)
+    ciphertext, tag = cipher.encrypt_and_digest(json.dumps(vote_data).encode())
+
+    # Combine nonce, tag, and ciphertext for storage
+    encrypted_blob = {
+        'nonce': b64encode(cipher.nonce).decode(),
+        'tag': b64encode(tag).decode(),
+        'ciphertext': b64encode(ciphertext).decode()
+    }
+    return json.dumps(encrypted_blob)
+
+
+def decrypt_vote_data(encrypted_vote_data, key):
+    """Return the vote dict; raises if the blob is malformed or fails authentication"""
+    encrypted_blob = json.loads(encrypted_vote_data)
+
+    nonce = b64decode(encrypted_blob['nonce'])
+    tag = b64decode(encrypted_blob['tag'])
+    ciphertext = b64decode(encrypted_blob['ciphertext'])
+
+    cipher = AES.new(key, AES.MODE_EAX, nonce=nonce)
+    decrypted_data = cipher.decrypt_and_verify(ciphertext, tag)
+
+    return json.loads(decrypted_data.decode())
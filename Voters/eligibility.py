@@ -0,0 +1,78 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import StudentRegistry
+
+ELIGIBILITY_VERSION_KEY = 'eligibility:version'
+
+# Entries are per version, so a stale one is never read; the timeout only clears old ones
+DEPARTMENTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def bump_eligibility_version():
+    """Tell every worker to rebuild its index once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(ELIGIBILITY_VERSION_KEY, time.time_ns(), None))
+
+
+def get_eligibility_version():
+    version = cache.get(ELIGIBILITY_VERSION_KEY)
+    if version is None:
+        cache.add(ELIGIBILITY_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(ELIGIBILITY_VERSION_KEY)
+    return version
+
+
+def registry_departments():
+    """Sorted distinct departments in the student registry, cached per registry version"""
+    # Read the version before querying so a concurrent bump is never masked
+    key = f'eligibility:departments:{get_eligibility_version()}'
+    departments = cache.get(key)
+    if departments is None:
+        departments = list(
+            StudentRegistry.objects.values_list('department', flat=True).distinct().order_by('department')
+        )
+        cache.set(key, departments, DEPARTMENTS_CACHE_TIMEOUT)
+    return departments
+
+
+class EligibilityIndex:
+    """Per-process set of active registration numbers.
+
+    Each lookup compares the shared version stamp in the cache with the one
+    the set was built for, and reloads the set from StudentRegistry only when
+    they differ, so checks normally cost no database queries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._reg_numbers = frozenset()
+
+    def _current(self):
+        # Read the version before loading so a concurrent bump is never masked
+        version = get_eligibility_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._reg_numbers = frozenset(
+                        StudentRegistry.objects.filter(is_active=True).values_list('reg_number', flat=True)
+                    )
+                    self._version = version
+        return self._reg_numbers
+
+    def __contains__(self, reg_number):
+        return bool(reg_number) and reg_number in self._current()
+
+    def __len__(self):
+        return len(self._current())
+
+
+eligibility_index = EligibilityIndex()
+
+
+def is_registered_student(reg_number):
+    """Whether reg_number belongs to an active student in the registry"""
+    return reg_number in eligibility_index
@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import VoterProfile, StudentRegistry
+from .eligibility import is_registered_student
 
 class CustomLoginForm(forms.Form):
     username = forms.CharField(
@@ -90,7 +91,7 @@ class VoterRegistrationForm(UserCreationForm):
         reg_number = self.cleaned_data.get('reg_number')
         
         # Check if registration number exists in student registry
-        if not StudentRegistry.objects.filter(reg_number=reg_number, is_active=True).exists():
+        if not is_registered_student(reg_number):
             raise forms.ValidationError('Invalid registration number. Please contact the administration.')
         
         # Check if registration number is already used
@@ -121,3 +122,26 @@ class VoterRegistrationForm(UserCreationForm):
                 is_approved=True
             )
         return user
+
+class BallotForm(forms.Form):
+    """One optional choice per position, validated against the ballot snapshot"""
+
+    def __init__(self, ballot, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for position in ballot:
+            self.fields[f"position_{position['id']}"] = forms.TypedChoiceField(
+                label=position['name'],
+                required=False,
+                coerce=int,
+                empty_value=None,
+                choices=[(candidate['id'], candidate['name']) for candidate in position['candidates']],
+                widget=forms.RadioSelect
+            )
+
+    def selections(self):
+        """Return {position_id: candidate_id} for the positions the voter filled in"""
+        return {
+            int(name.split('_', 1)[1]): candidate_id
+            for name, candidate_id in self.cleaned_data.items()
+            if candidate_id is not None
+        }
@@ -0,0 +1,342 @@
+import json
+import logging
+import os
+import threading
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from Admin.models import AuditLog, Candidate, Position
+from Admin.counters import bump_results_version, increment_vote_count
+from Admin.stats import add_to_stats, encrypted_vote_stats, vote_stats, voter_stats
+from .merkle import append_votes
+from .models import EncryptedVote, Vote, VoteJournalCheckpoint, VoterProfile
+
+# fcntl locks serialise appends across worker processes (POSIX only)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger('election')
+
+JOURNAL_NAME = 'votes.journal'
+
+# pending/<voter id>/<position id> holds the candidate a voter has journalled for a
+# position until the applier has processed the entry, however long that takes
+PENDING_DIR = 'pending'
+
+_append_lock = threading.Lock()
+
+
+class VoteJournalError(Exception):
+    """Raised when the journal cannot be applied"""
+
+
+def journal_path():
+    return Path(settings.VOTE_JOURNAL_DIR) / JOURNAL_NAME
+
+
+def _marker_path(directory, voter_id, position_id):
+    return directory / PENDING_DIR / str(voter_id) / str(position_id)
+
+
+def _encode(record):
+    """One journal line: CRC32 of the JSON payload, a space, the payload"""
+    payload = json.dumps(record, separators=(',', ':')).encode()
+    return b'%08x %s\n' % (zlib.crc32(payload), payload)
+
+
+def _decode(line):
+    """The record on a journal line (without its newline), or None if it is damaged"""
+    try:
+        checksum, payload = line.split(b' ', 1)
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+@contextmanager
+def _locked(directory):
+    with _append_lock:
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        with open(directory / '.journal.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def append_ballot(voter, candidates):
+    """Durably record a validated ballot for the applier and return its entry id.
+
+    The record is on disk (fsync'd) when this returns, so the voter can be
+    told their vote is in even though the database has not seen it yet.
+    Returns None, writing nothing, if one of the positions already has a
+    journalled ballot from this voter.
+    """
+    entry = {
+        'id': uuid.uuid4().hex,
+        'voter': voter.id,
+        'votes': [[candidate.position_id, candidate.id] for candidate in candidates],
+        'at': timezone.now().isoformat(),
+    }
+    path = journal_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    markers = [_marker_path(path.parent, voter.id, candidate.position_id) for candidate in candidates]
+    with _locked(path.parent):
+        # Every writer holds the journal lock, so this check-and-set is atomic. Markers go in
+        # after the fsync: a crash in between can let a retry through (the applier rejects
+        # it) but never blocks a position with no ballot behind it.
+        if any(marker.exists() for marker in markers):
+            return None
+        _write(path, entry)
+        for marker, candidate in zip(markers, candidates):
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.write_text(str(candidate.id))
+
+    return entry['id']
+
+
+def _write(path, entry):
+    """Append one entry and fsync it; the caller holds the journal lock"""
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        size = os.fstat(fd).st_size
+        data = _encode(entry)
+        if size == 0:
+            # New journal; the checkpoint is kept per journal id
+            data = _encode({'journal': uuid.uuid4().hex}) + data
+        else:
+            os.lseek(fd, size - 1, os.SEEK_SET)
+            if os.read(fd, 1) != b'\n':
+                # A writer died mid-record; end its fragment so it cannot swallow this one
+                data = b'\n' + data
+
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    if size == 0:
+        _fsync_dir(path.parent)
+
+
+def pending_votes(voter):
+    """{position_id: candidate_id} journalled for this voter but possibly not applied yet"""
+    if not settings.VOTE_INTAKE_JOURNAL:
+        return {}
+    pending = {}
+    try:
+        for marker in os.scandir(journal_path().parent / PENDING_DIR / str(voter.id)):
+            try:
+                pending[int(marker.name)] = int(Path(marker.path).read_text())
+            except (OSError, ValueError):
+                pass  # Removed by the applier meanwhile
+    except FileNotFoundError:
+        pass
+    return pending
+
+
+class JournalApplier:
+    """Drains the journal into Vote, EncryptedVote and the vote counters.
+
+    Each batch is applied in one transaction that also moves the journal's
+    VoteJournalCheckpoint past it, so after a crash the applier resumes at
+    the first entry whose effects were not committed: every entry is
+    applied exactly once. Only one applier may run per journal directory.
+    """
+
+    def __init__(self, path=None, batch_size=None):
+        self.path = Path(path) if path else journal_path()
+        self.batch_size = batch_size or settings.VOTE_JOURNAL_BATCH_SIZE
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the applier lock for the journal directory, or raise VoteJournalError"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        with open(self.path.parent / '.applier.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise VoteJournalError('Another applier is already running for this journal.')
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _header(self, f):
+        """(journal id, offset of the first entry), or (None, 0) if not written yet"""
+        f.seek(0)
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            return None, 0
+        record = _decode(line[:-1])
+        if not record or 'journal' not in record:
+            raise VoteJournalError(f'{self.path} does not start with a journal header.')
+        return record['journal'], len(line)
+
+    def _read(self, f, offset):
+        """Up to batch_size complete entries from offset, and the offset after them"""
+        f.seek(offset)
+        entries = []
+        while len(entries) < self.batch_size:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break  # Still being written
+            offset += len(line)
+            record = _decode(line[:-1])
+            if record is None:
+                # Fragment left by a writer that died before its fsync; never acknowledged
+                logger.warning(f'Skipping damaged vote journal line ending at byte {offset}')
+                continue
+            entries.append(record)
+        return entries, offset
+
+    def apply_batch(self):
+        """Apply the next batch; return (entries read, applied, rejected)"""
+        if not self.path.exists():
+            return 0, 0, 0
+
+        # Under the journal lock, so every entry read already has its pending markers
+        with _locked(self.path.parent), open(self.path, 'rb') as f:
+            journal_id, start = self._header(f)
+            if journal_id is None:
+                return 0, 0, 0
+
+            checkpoint, _ = VoteJournalCheckpoint.objects.get_or_create(
+                journal_id=journal_id, defaults={'offset': start}
+            )
+            entries, end = self._read(f, checkpoint.offset)
+
+        if end == checkpoint.offset:
+            return 0, 0, 0
+
+        with transaction.atomic():
+            applied, rejected = self._apply(entries)
+            updated = VoteJournalCheckpoint.objects.filter(
+                id=checkpoint.id, offset=checkpoint.offset
+            ).update(
+                offset=end,
+                applied=checkpoint.applied + len(applied),
+                rejected=checkpoint.rejected + len(rejected),
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                raise VoteJournalError('The checkpoint moved underneath this applier.')
+            # Before the commit: a crash in between leaves the entries unapplied without
+            # markers, so a retried ballot can reach the journal and is rejected there.
+            # After it, a crash would leave markers that no later batch ever removes.
+            self._release(entries)
+
+        return len(entries), len(applied), len(rejected)
+
+    def _release(self, entries):
+        """Remove the pending markers of entries that are applied or rejected"""
+        for entry in entries:
+            for position_id, _ in entry['votes']:
+                _marker_path(self.path.parent, entry['voter'], position_id).unlink(missing_ok=True)
+
+    def apply_pending(self):
+        """Apply batches until the journal is drained; return (applied, rejected)"""
+        applied = rejected = 0
+        while True:
+            read, batch_applied, batch_rejected = self.apply_batch()
+            if not read:
+                return applied, rejected
+            applied += batch_applied
+            rejected += batch_rejected
+
+    def _apply(self, entries):
+        voters = VoterProfile.objects.select_related('user').in_bulk({entry['voter'] for entry in entries})
+        candidates = Candidate.objects.select_related('position').in_bulk(
+            {candidate_id for entry in entries for _, candidate_id in entry['votes']}
+        )
+        # Read inside the write transaction, so nothing can slip in before the inserts
+        taken = set(Vote.objects.filter(voter_id__in=voters).values_list('voter_id', 'position_id'))
+
+        votes, encrypted_votes, counts = [], [], Counter()
+        applied, rejected = [], []
+        for entry in entries:
+            voter = voters.get(entry['voter'])
+            picks = [candidates.get(candidate_id) for _, candidate_id in entry['votes']]
+
+            if voter is None or None in picks:
+                reason = 'voter or candidate no longer exists'
+            else:
+                keys = {(voter.id, c.position_id) for c in picks}
+                reason = 'already voted for one or more positions' if keys & taken or len(keys) != len(picks) else None
+
+            if reason:
+                logger.warning(f"Rejected journalled ballot {entry['id']}: {reason}")
+                rejected.append(entry)
+                continue
+
+            taken |= keys
+            votes += [Vote(voter=voter, candidate=c, position_id=c.position_id) for c in picks]
+            encrypted_votes += [EncryptedVote.build_vote(voter, c) for c in picks]
+            counts.update(c.id for c in picks)
+            applied.append((voter, picks))
+
+        if not applied:
+            return applied, rejected
+
+        Vote.objects.bulk_create(votes)
+        append_votes(encrypted_votes)
+        EncryptedVote.objects.bulk_create(encrypted_votes)
+        for candidate_id, amount in counts.items():
+            increment_vote_count(candidate_id, amount)
+        stats = vote_stats([vote.position_id for vote in votes]) + encrypted_vote_stats(len(encrypted_votes))
+        bump_results_version()
+
+        # Mark voters who now cover every active position
+        total_positions = Position.objects.filter(is_active=True).count()
+        finished = (
+            Vote.objects.filter(voter_id__in={voter.id for voter, _ in applied}, position__is_active=True)
+            .values('voter_id').annotate(votes=Count('id')).filter(votes__gte=total_positions)
+            .values_list('voter_id', flat=True)
+        )
+        finishing = VoterProfile.objects.filter(id__in=list(finished), has_voted=False)
+        for category, is_approved, department in finishing.values_list('category', 'is_approved', 'department'):
+            stats.update(voter_stats(category, is_approved, True, department))
+            stats.subtract(voter_stats(category, is_approved, False, department))
+        finishing.update(has_voted=True, updated_at=timezone.now())
+        add_to_stats(stats)
+
+        for voter, picks in applied:
+            AuditLog.log_action(
+                user=voter.user,
+                action='VOTE',
+                description=f"Ballot cast for positions: {', '.join(c.position.name for c in picks)}"
+            )
+
+        return applied, rejected
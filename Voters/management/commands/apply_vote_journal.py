@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Voters.intake import JournalApplier, VoteJournalError
+
+
+class Command(BaseCommand):
+    help = 'Write ballots from the vote intake journal to the database (run exactly one of these)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the journal and exit')
+        parser.add_argument('--batch-size', type=int, help='Entries per transaction (default: VOTE_JOURNAL_BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, help='Seconds between polls (default: VOTE_JOURNAL_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        applier = JournalApplier(batch_size=options['batch_size'])
+        interval = options['interval'] or settings.VOTE_JOURNAL_POLL_INTERVAL
+
+        try:
+            with applier.exclusive():
+                self.stdout.write(f'Applying {applier.path}')
+                while True:
+                    applied, rejected = applier.apply_pending()
+                    if applied or rejected:
+                        self.stdout.write(f'Applied {applied} ballots, rejected {rejected}.')
+                    if options['once']:
+                        break
+                    time.sleep(interval)
+        except VoteJournalError as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Vote journal applier stopped.'))
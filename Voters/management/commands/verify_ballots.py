@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Admin.models import AuditLog
+from Voters.ballot_verification import verify_ballots
+
+
+class Command(BaseCommand):
+    help = 'Decrypt every encrypted ballot and cross-check the tally against recorded counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, help='Worker processes (default: BALLOT_VERIFY_WORKERS or one per CPU)')
+
+    def handle(self, *args, **options):
+        def progress(processed):
+            self.stdout.write(f'  {processed} ballots queued')
+
+        result = verify_ballots(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            progress=progress
+        )
+
+        self.stdout.write(f"{'Candidate':<40}{'Encrypted':>10}{'Votes':>8}{'Counters':>10}{'vote_count':>12}")
+        for row in result.rows:
+            name = str(row['candidate']) if row['candidate'] else f"Unknown candidate #{row['candidate_id']}"
+            line = (f"{name[:39]:<40}{row['encrypted']:>10}{row['votes']:>8}"
+                    f"{row['counters']:>10}{row['vote_count']:>12}")
+            self.stdout.write(line if row['matches'] else self.style.ERROR(line))
+
+        summary = (f"{result.ballots} ballots verified, {result.failure_count} failed to decrypt, "
+                   f"{len(result.mismatches)} candidate count mismatches")
+
+        AuditLog.log_action(
+            user=None,
+            action='ADMIN_ACTION',
+            description=f"Ballot verification: {summary}"
+        )
+
+        if result.failed_ids:
+            self.stderr.write(f"Failed ballot ids: {', '.join(map(str, result.failed_ids))}")
+        if not result.ok:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
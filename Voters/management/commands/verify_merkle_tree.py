@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Voters.merkle import VERIFY_CHUNK_SIZE, verify_tree
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ballot hash tree from the encrypted ballots in one pass and compare it with the stored tree'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=VERIFY_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        result = verify_tree(chunk_size=options['chunk_size'])
+
+        for problem in result.problems:
+            self.stderr.write(problem)
+
+        summary = f'{result.leaves} ballots, root {result.root}'
+        if not result.ok:
+            raise CommandError(f'Hash tree does not match the ballots ({summary})')
+        self.stdout.write(self.style.SUCCESS(f'Hash tree verified: {summary}'))
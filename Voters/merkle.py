@@ -0,0 +1,260 @@
+"""Append-only Merkle tree over the encrypted ballots.
+
+Every EncryptedVote gets a leaf index (merkle_index) when it is inserted and
+is hashed into the tree in the same transaction. Hashing follows RFC 6962
+(Certificate Transparency), so proofs can be checked with any CT library.
+
+Only complete subtrees are stored, as MerkleNode rows keyed by (level,
+index), level 0 being the leaves. MerkleState keeps the tree size, the root
+and the frontier: the roots of the complete subtrees the tree is made of,
+one per set bit of the size. An append hashes at most log2(n) nodes and an
+inclusion proof reads at most about 2 * log2(n) stored nodes.
+"""
+
+import hashlib
+import json
+from functools import reduce
+
+from django.db.models import Q
+
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+# Leaves per round trip while verifying the whole tree
+VERIFY_CHUNK_SIZE = 2000
+
+
+def leaf_data(index, voter_hash, position_id, encrypted_vote_data):
+    """The bytes a ballot's leaf commits to"""
+    return json.dumps([index, voter_hash, position_id, encrypted_vote_data], separators=(',', ':')).encode()
+
+
+def leaf_hash(data):
+    return hashlib.sha256(b'\x00' + data).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _fold(hashes):
+    """Hash of consecutive complete subtrees, largest (leftmost) first"""
+    return reduce(lambda right, left: node_hash(left, right), reversed(hashes[:-1]), hashes[-1])
+
+
+class Frontier:
+    """Right edge of the tree: enough to append leaves and compute the root"""
+
+    def __init__(self, size=0, nodes=None):
+        self.size = size
+        self.nodes = [list(node) for node in nodes or []]  # [level, hash], largest subtree first
+
+    def append(self, leaf):
+        """Add a leaf hash and return the nodes it completes as (level, index, hash)"""
+        level, index, value = 0, self.size, leaf
+        created = [(level, index, value)]
+        while self.nodes and self.nodes[-1][0] == level:
+            value = node_hash(self.nodes.pop()[1], value)
+            level, index = level + 1, index // 2
+            created.append((level, index, value))
+        self.nodes.append([level, value])
+        self.size += 1
+        return created
+
+    def root(self):
+        if not self.nodes:
+            return EMPTY_ROOT
+        return _fold([value for _, value in self.nodes])
+
+
+def _subtree(start, size):
+    """(level, index) of the stored nodes that make up leaves [start, start + size)"""
+    coords = []
+    while size:
+        level = size.bit_length() - 1
+        coords.append((level, start >> level))
+        start += 1 << level
+        size -= 1 << level
+    return coords
+
+
+def _audit_path(index, size):
+    """Sibling subtrees of a leaf, bottom up, each as a list of node coordinates"""
+    path = []
+    start = 0
+    while size > 1:
+        split = 1 << ((size - 1).bit_length() - 1)  # largest power of two below size
+        if index - start < split:
+            path.append(_subtree(start + split, size - split))
+            size = split
+        else:
+            path.append(_subtree(start, split))
+            start += split
+            size -= split
+    return path[::-1]
+
+
+def verify_inclusion(leaf, index, size, path, root):
+    """Check an inclusion proof (RFC 9162, section 2.1.3.2)"""
+    if index >= size:
+        return False
+    fn, sn, value = index, size - 1, leaf
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            value = node_hash(sibling, value)
+            while not fn & 1 and fn:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            value = node_hash(value, sibling)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and value == root
+
+
+def _coords_filter(coords):
+    return reduce(lambda q, c: q | Q(level=c[0], index=c[1]), coords, Q(pk__in=[]))
+
+
+def append_votes(encrypted_votes):
+    """Give unsaved EncryptedVotes their leaf indexes and hash them into the tree.
+
+    Call inside the transaction that inserts the votes, before inserting
+    them; the state row lock keeps concurrent appends in order.
+    """
+    from .models import MerkleNode, MerkleState
+
+    state, _ = MerkleState.objects.select_for_update().get_or_create(pk=1)
+    frontier = Frontier(state.size, state.frontier)
+
+    nodes = []
+    for vote in encrypted_votes:
+        vote.merkle_index = frontier.size
+        nodes += frontier.append(vote.leaf_hash())
+
+    MerkleNode.objects.bulk_create([MerkleNode(level=level, index=index, hash=value) for level, index, value in nodes])
+    state.size = frontier.size
+    state.frontier = frontier.nodes
+    state.root = frontier.root()
+    state.save(update_fields=['size', 'frontier', 'root', 'updated_at'])
+
+
+def tree_head():
+    """{'size', 'root', 'updated_at'} of the current tree"""
+    from .models import MerkleState
+
+    state = MerkleState.objects.filter(pk=1).first()
+    if state is None:
+        return {'size': 0, 'root': EMPTY_ROOT, 'updated_at': None}
+    return {'size': state.size, 'root': state.root, 'updated_at': state.updated_at}
+
+
+def inclusion_proof(index, size=None):
+    """Audit path for leaf ``index`` in the tree of ``size`` leaves (default: current).
+
+    Returns None if the leaf is not in that tree. Earlier sizes work too, so
+    a proof can be checked against a root published a while ago.
+    """
+    from .models import MerkleNode
+
+    head = tree_head()
+    size = head['size'] if size is None else size
+    if not 0 <= index < size <= head['size']:
+        return None
+
+    path = _audit_path(index, size)
+    root_coords = _subtree(0, size)
+    wanted = {(0, index), *root_coords, *(c for sibling in path for c in sibling)}
+    stored = {
+        (level, node_index): value
+        for level, node_index, value in MerkleNode.objects.filter(_coords_filter(wanted)).values_list('level', 'index', 'hash')
+    }
+
+    return {
+        'index': index,
+        'size': size,
+        'leaf_hash': stored[(0, index)],
+        'path': [_fold([stored[c] for c in sibling]) for sibling in path],
+        'root': _fold([stored[c] for c in root_coords]),
+    }
+
+
+class TreeVerification:
+    def __init__(self):
+        self.leaves = 0
+        self.root = EMPTY_ROOT
+        self.expected_root = EMPTY_ROOT
+        self.expected_size = 0
+        self.problems = []
+
+    @property
+    def ok(self):
+        return not self.problems and self.leaves == self.expected_size and self.root == self.expected_root
+
+
+def _check_nodes(created, result):
+    """Compare one chunk's recomputed nodes against the stored ones"""
+    from .models import MerkleNode
+
+    # Each level's nodes from a run of consecutive leaves are a contiguous index range
+    ranges = {}
+    for level, index, _ in created:
+        low, high = ranges.get(level, (index, index))
+        ranges[level] = (min(low, index), max(high, index))
+    condition = reduce(
+        lambda q, item: q | Q(level=item[0], index__range=item[1]), ranges.items(), Q(pk__in=[])
+    )
+    stored = {
+        (level, index): value
+        for level, index, value in MerkleNode.objects.filter(condition).values_list('level', 'index', 'hash')
+    }
+
+    for level, index, value in created:
+        if stored.get((level, index)) != value:
+            result.problems.append(f'Stored node at level {level}, index {index} does not match the ballots')
+
+
+def verify_tree(chunk_size=VERIFY_CHUNK_SIZE, max_problems=100):
+    """Rebuild the tree from EncryptedVote in one streaming pass and compare.
+
+    Checks that leaf indexes run 0..n-1 without gaps, that every stored node
+    matches the ballots and that the stored root and size match. Memory use
+    is one chunk plus the frontier.
+    """
+    from .models import EncryptedVote
+
+    head = tree_head()
+    result = TreeVerification()
+    result.expected_size, result.expected_root = head['size'], head['root']
+
+    unindexed = EncryptedVote.objects.filter(merkle_index__isnull=True).count()
+    if unindexed:
+        result.problems.append(f'{unindexed} ballots are not in the tree')
+
+    rows = (
+        EncryptedVote.objects.filter(merkle_index__isnull=False).order_by('merkle_index')
+        .values_list('merkle_index', 'voter_hash', 'position_id', 'encrypted_vote_data')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    frontier = Frontier()
+    created = []
+    for index, voter_hash, position_id, encrypted_vote_data in rows:
+        if index != frontier.size:
+            result.problems.append(f'Leaf index {frontier.size} is missing (next ballot has {index})')
+            break
+        created += frontier.append(leaf_hash(leaf_data(index, voter_hash, position_id, encrypted_vote_data)))
+        if frontier.size % chunk_size == 0:
+            _check_nodes(created, result)
+            created = []
+        if len(result.problems) >= max_problems:
+            break
+    if created:
+        _check_nodes(created, result)
+
+    result.leaves = frontier.size
+    result.root = frontier.root()
+    if result.leaves != result.expected_size:
+        result.problems.append(f'Found {result.leaves} leaves but the tree records {result.expected_size}')
+    if result.root != result.expected_root:
+        result.problems.append(f'Recomputed root {result.root} does not match the stored root {result.expected_root}')
+    return result
@@ -0,0 +1,29 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import VoterProfile
+
+
+def get_voter_profile(user):
+    """Return the user's VoterProfile, or None.
+
+    Goes through the user.voterprofile relation, which caches the result
+    (including a miss) on the user object, so is_admin, the views and the
+    templates all share one query per request.
+    """
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.voterprofile
+    except VoterProfile.DoesNotExist:
+        return None
+
+
+class VoterProfileMiddleware:
+    """Expose the logged-in user's profile as request.voter_profile, loaded on first use"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.voter_profile = SimpleLazyObject(lambda: get_voter_profile(request.user))
+        return self.get_response(request)
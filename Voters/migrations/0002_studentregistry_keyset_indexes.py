@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Voters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentregistry',
+            index=models.Index(fields=['created_at', 'id'], name='registry_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentregistry',
+            index=models.Index(fields=['department', 'created_at', 'id'], name='registry_dept_created_idx'),
+        ),
+    ]
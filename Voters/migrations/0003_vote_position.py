@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_vote_position(apps, schema_editor):
+    Vote = apps.get_model('Voters', 'Vote')
+    Candidate = apps.get_model('Admin', 'Candidate')
+
+    Vote.objects.update(
+        position_id=Subquery(Candidate.objects.filter(id=OuterRef('candidate_id')).values('position_id')[:1])
+    )
+
+    # The unique index added next would fail on these; they need a person to resolve
+    duplicates = (
+        Vote.objects.values('voter_id', 'position_id')
+        .annotate(votes=Count('id'))
+        .filter(votes__gt=1)
+        .count()
+    )
+    if duplicates:
+        raise RuntimeError(
+            f'{duplicates} voter(s) have more than one vote for the same position. '
+            'Remove the extra Vote rows before running this migration.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Admin', '0005_auditlog_user_no_db_constraint'),
+        ('Voters', '0002_studentregistry_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='position',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='Admin.position'),
+        ),
+        migrations.RunPython(backfill_vote_position, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='position',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Admin.position'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together={('voter', 'position')},
+        ),
+    ]
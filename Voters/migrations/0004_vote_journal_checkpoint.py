@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Voters', '0003_vote_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteJournalCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('journal_id', models.CharField(max_length=32, unique=True)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('applied', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:30
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+# Frozen copy of the hashing in Voters/merkle.py as of this migration (RFC 6962
+# leaf and node hashes), so later changes there cannot change what it builds
+
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()
+
+
+def leaf_hash(index, voter_hash, position_id, encrypted_vote_data):
+    data = json.dumps([index, voter_hash, position_id, encrypted_vote_data], separators=(',', ':')).encode()
+    return hashlib.sha256(b'\x00' + data).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+class Frontier:
+    def __init__(self):
+        self.size = 0
+        self.nodes = []  # [level, hash], largest subtree first
+
+    def append(self, leaf):
+        """Add a leaf hash and return the nodes it completes as (level, index, hash)"""
+        level, index, value = 0, self.size, leaf
+        created = [(level, index, value)]
+        while self.nodes and self.nodes[-1][0] == level:
+            value = node_hash(self.nodes.pop()[1], value)
+            level, index = level + 1, index // 2
+            created.append((level, index, value))
+        self.nodes.append([level, value])
+        self.size += 1
+        return created
+
+    def root(self):
+        if not self.nodes:
+            return EMPTY_ROOT
+        value = self.nodes[-1][1]
+        for _, left in reversed(self.nodes[:-1]):
+            value = node_hash(left, value)
+        return value
+
+
+def build_merkle_tree(apps, schema_editor):
+    """Add the ballots cast so far to the tree, in insertion order"""
+    EncryptedVote = apps.get_model('Voters', 'EncryptedVote')
+    MerkleNode = apps.get_model('Voters', 'MerkleNode')
+    MerkleState = apps.get_model('Voters', 'MerkleState')
+
+    frontier = Frontier()
+    votes, nodes = [], []
+
+    def flush():
+        EncryptedVote.objects.bulk_update(votes, ['merkle_index'])
+        MerkleNode.objects.bulk_create([MerkleNode(level=level, index=index, hash=value) for level, index, value in nodes])
+        votes.clear()
+        nodes.clear()
+
+    for vote in EncryptedVote.objects.order_by('id').iterator(chunk_size=2000):
+        vote.merkle_index = frontier.size
+        votes.append(vote)
+        nodes.extend(frontier.append(leaf_hash(
+            vote.merkle_index, vote.voter_hash, vote.position_id, vote.encrypted_vote_data
+        )))
+        if len(votes) >= 2000:
+            flush()
+    flush()
+
+    MerkleState.objects.create(pk=1, size=frontier.size, root=frontier.root(), frontier=frontier.nodes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Voters', '0004_vote_journal_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerkleState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.BigIntegerField(default=0)),
+                ('root', models.CharField(default='e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855', max_length=64)),
+                ('frontier', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='encryptedvote',
+            name='merkle_index',
+            field=models.BigIntegerField(editable=False, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='MerkleNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.SmallIntegerField()),
+                ('index', models.BigIntegerField()),
+                ('hash', models.CharField(max_length=64)),
+            ],
+            options={
+                'unique_together': {('level', 'index')},
+            },
+        ),
+        migrations.RunPython(build_merkle_tree, migrations.RunPython.noop),
+    ]
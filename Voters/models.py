@@ -1,11 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
-from Admin.models import Candidate, AuditLog
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
-from base64 import b64encode, b64decode
+from Admin.models import Position, Candidate, AuditLog
+from Admin.counters import bump_results_version, increment_vote_count
+from Admin.stats import add_to_stats, encrypted_vote_stats, vote_stats
 from django.conf import settings
-import json
+from .crypto import derive_key, encrypt_vote_data, decrypt_vote_data
+from .merkle import EMPTY_ROOT, append_votes, leaf_data, leaf_hash
+import hashlib
 import logging
 
 logger = logging.getLogger('election')
@@ -20,6 +21,13 @@ class StudentRegistry(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        # Keyset pagination on (created_at, id), optionally narrowed by department
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='registry_created_id_idx'),
+            models.Index(fields=['department', 'created_at', 'id'], name='registry_dept_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.reg_number} - {self.full_name}"
 
@@ -43,19 +51,27 @@ class VoterProfile(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name() or self.user.username} ({self.category})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored values, so the stats signals can diff a save without re-reading the row
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if hasattr(self, '_loaded_values'):
+            names = fields or [field.attname for field in self._meta.concrete_fields]
+            self._loaded_values.update((name, self.__dict__[name]) for name in names if name in self.__dict__)
+    
     def is_eligible_voter(self):
         """Check if the voter is eligible to vote"""
         if self.category != 'Voter':
             return False
         
         # Check if registration number exists in student registry
-        if self.reg_number:
-            return StudentRegistry.objects.filter(
-                reg_number=self.reg_number,
-                is_active=True
-            ).exists()
-        
-        return False
+        from .eligibility import is_registered_student
+        return is_registered_student(self.reg_number)
 
 class EncryptedVote(models.Model):
     """Model to store encrypted votes for ballot secrecy"""
@@ -63,6 +79,8 @@ class EncryptedVote(models.Model):
     encrypted_vote_data = models.TextField()  # Encrypted vote information
     position_id = models.IntegerField()  # Position voted for
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Leaf in the Merkle tree over all ballots, see Voters/merkle.py
+    merkle_index = models.BigIntegerField(null=True, unique=True, editable=False)
     
     class Meta:
         unique_together = ['voter_hash', 'position_id']
@@ -70,11 +88,12 @@ class EncryptedVote(models.Model):
     def __str__(self):
         return f"Encrypted Vote - Position {self.position_id} - {self.timestamp}"
     
+    def leaf_hash(self):
+        return leaf_hash(leaf_data(self.merkle_index, self.voter_hash, self.position_id, self.encrypted_vote_data))
+    
     @classmethod
-    def cast_vote(cls, voter, candidate):
-        """Cast an encrypted vote"""
-        import hashlib
-        
+    def build_vote(cls, voter, candidate):
+        """Build an unsaved encrypted vote for one candidate"""
         # Create a hash of the voter for anonymity
         voter_hash = hashlib.sha256(f"{voter.id}_{voter.reg_number}".encode()).hexdigest()
         
@@ -86,25 +105,23 @@ class EncryptedVote(models.Model):
             'position_name': candidate.position.name,
             'timestamp': str(timezone.now())
         }
-        key = hashlib.sha256(settings.VOTE_ENCRYPTION_KEY.encode()).digest()  # 32-byte key
-        cipher = AES.new(key, AES.MODE_EAX)
-        ciphertext, tag = cipher.encrypt_and_digest(json.dumps(vote_data).encode())
-
-        # Combine nonce, tag, and ciphertext for storage
-        encrypted_blob = {
-            'nonce': b64encode(cipher.nonce).decode(),
-            'tag': b64encode(tag).decode(),
-            'ciphertext': b64encode(ciphertext).decode()
-        }
 
-        encrypted_vote = cls.objects.create(
+        return cls(
             voter_hash=voter_hash,
-            encrypted_vote_data=json.dumps(encrypted_blob),
+            encrypted_vote_data=encrypt_vote_data(vote_data, derive_key(settings.VOTE_ENCRYPTION_KEY)),
             position_id=candidate.position.id
         )
 
-        candidate.vote_count += 1
-        candidate.save()
+    @classmethod
+    def cast_vote(cls, voter, candidate):
+        """Cast an encrypted vote"""
+        encrypted_vote = cls.build_vote(voter, candidate)
+        append_votes([encrypted_vote])
+        encrypted_vote.save()
+
+        increment_vote_count(candidate.id)
+        add_to_stats(vote_stats([candidate.position_id]) + encrypted_vote_stats(1))
+        bump_results_version()
 
         AuditLog.log_action(
             user=voter.user,
@@ -115,20 +132,35 @@ class EncryptedVote(models.Model):
         return encrypted_vote
 
     @classmethod
-    def decrypt_vote(cls, encrypted_vote):
-        """Decrypt a vote for admin purposes (if needed)"""
-        try:
-            encrypted_blob = json.loads(encrypted_vote.encrypted_vote_data)
-            key = hashlib.sha256(settings.VOTE_ENCRYPTION_KEY.encode()).digest()
+    def cast_ballot(cls, voter, candidates):
+        """Cast encrypted votes for several positions with a single insert"""
+        encrypted_votes = [cls.build_vote(voter, candidate) for candidate in candidates]
+        append_votes(encrypted_votes)
+        cls.objects.bulk_create(encrypted_votes)
 
-            nonce = b64decode(encrypted_blob['nonce'])
-            tag = b64decode(encrypted_blob['tag'])
-            ciphertext = b64decode(encrypted_blob['ciphertext'])
+        for candidate in candidates:
+            increment_vote_count(candidate.id)
+        add_to_stats(
+            vote_stats([candidate.position_id for candidate in candidates]) + encrypted_vote_stats(len(encrypted_votes))
+        )
+        bump_results_version()
 
-            cipher = AES.new(key, AES.MODE_EAX, nonce=nonce)
-            decrypted_data = cipher.decrypt_and_verify(ciphertext, tag)
+        AuditLog.log_action(
+            user=voter.user,
+            action='VOTE',
+            description=f"Ballot cast for positions: {', '.join(c.position.name for c in candidates)}"
+        )
+
+        return encrypted_votes
 
-            return json.loads(decrypted_data.decode())
+    @classmethod
+    def decrypt_vote(cls, encrypted_vote):
+        """Decrypt a vote for admin purposes (if needed)"""
+        try:
+            return decrypt_vote_data(
+                encrypted_vote.encrypted_vote_data,
+                derive_key(settings.VOTE_ENCRYPTION_KEY)
+            )
         except Exception as e:
             logger.error(f"Failed to decrypt vote: {e}")
             return None
@@ -137,13 +169,57 @@ class Vote(models.Model):
     """Traditional vote model for tracking (non-encrypted for admin purposes)"""
     voter = models.ForeignKey(VoterProfile, on_delete=models.CASCADE)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
+    # Copy of candidate.position so "one vote per position" is a unique index
+    position = models.ForeignKey(Position, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ['voter', 'candidate']
+        unique_together = ['voter', 'position']
+    
+    def __str__(self):
+        return f"Vote - Position: {self.position.name} - {self.timestamp}"
+    
+    def save(self, *args, **kwargs):
+        if self.position_id is None:
+            self.position_id = self.candidate.position_id
+        super().save(*args, **kwargs)
+
+class VoteJournalCheckpoint(models.Model):
+    """How far the vote intake journal has been applied (see Voters/intake.py).
+
+    Moved forward in the same transaction as the votes it covers, so a crash
+    either keeps both or neither.
+    """
+    journal_id = models.CharField(max_length=32, unique=True)
+    offset = models.BigIntegerField(default=0)  # bytes of the journal file applied
+    applied = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Journal {self.journal_id} at byte {self.offset}"
+
+class MerkleNode(models.Model):
+    """Root of a complete subtree of the ballot Merkle tree (level 0 = one ballot)"""
+    level = models.SmallIntegerField()
+    index = models.BigIntegerField()
+    hash = models.CharField(max_length=64)
+    
+    class Meta:
+        unique_together = ['level', 'index']
+    
+    def __str__(self):
+        return f"Merkle node {self.level}/{self.index}"
+
+class MerkleState(models.Model):
+    """Size, root and frontier of the ballot Merkle tree (a single row)"""
+    size = models.BigIntegerField(default=0)
+    root = models.CharField(max_length=64, default=EMPTY_ROOT)
+    frontier = models.JSONField(default=list)  # [[level, hash], ...], largest subtree first
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return f"Vote - Position: {self.candidate.position.name} - {self.timestamp}"
+        return f"Merkle tree of {self.size} ballots: {self.root}"
 
 # Import timezone after models are defined
 from django.utils import timezone
@@ -0,0 +1,61 @@
+from collections import Counter
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from Admin.stats import add_to_stats, encrypted_vote_stats, vote_stats, voter_stats
+from .models import EncryptedVote, StudentRegistry, Vote, VoterProfile
+from .eligibility import bump_eligibility_version
+
+STATS_FIELDS = ['category', 'is_approved', 'has_voted', 'department']
+
+
+@receiver([post_save, post_delete], sender=StudentRegistry)
+def invalidate_eligibility(sender, **kwargs):
+    bump_eligibility_version()
+
+
+@receiver(pre_save, sender=VoterProfile)
+def remember_voter_stats(sender, instance, **kwargs):
+    # What the stored row counts for now, to diff against after the save
+    loaded = getattr(instance, '_loaded_values', {})
+    if instance._state.adding:
+        old = None
+    elif all(field in loaded for field in STATS_FIELDS):
+        # Loaded from the database, e.g. request.voter_profile: no extra query
+        old = [loaded[field] for field in STATS_FIELDS]
+    else:
+        old = VoterProfile.objects.filter(pk=instance.pk).values_list(*STATS_FIELDS).first()
+    instance._stats_before = voter_stats(*old) if old else Counter()
+
+
+@receiver(post_save, sender=VoterProfile)
+def update_voter_stats(sender, instance, **kwargs):
+    current = [getattr(instance, field) for field in STATS_FIELDS]
+    changes = voter_stats(*current)
+    changes.subtract(getattr(instance, '_stats_before', Counter()))
+    add_to_stats(changes)
+    # The row now holds these values, for the next save of this instance
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **dict(zip(STATS_FIELDS, current))}
+
+
+@receiver(post_delete, sender=VoterProfile)
+def remove_voter_stats(sender, instance, **kwargs):
+    changes = Counter()
+    changes.subtract(voter_stats(*(getattr(instance, field) for field in STATS_FIELDS)))
+    add_to_stats(changes)
+
+
+@receiver(post_delete, sender=Vote)
+def remove_vote_stats(sender, instance, **kwargs):
+    # Votes go when their candidate or position is deleted
+    changes = Counter()
+    changes.subtract(vote_stats([instance.position_id]))
+    add_to_stats(changes)
+
+
+@receiver(post_delete, sender=EncryptedVote)
+def remove_encrypted_vote_stats(sender, instance, **kwargs):
+    changes = Counter()
+    changes.subtract(encrypted_vote_stats(1))
+    add_to_stats(changes)
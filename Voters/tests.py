@@ -0,0 +1,340 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from Admin.models import Candidate, Position
+from Admin.counters import vote_counts
+from .eligibility import registry_departments
+from .intake import JournalApplier, _encode, append_ballot, journal_path, pending_votes
+from .merkle import (
+    EMPTY_ROOT, Frontier, _audit_path, _fold, _subtree, append_votes, inclusion_proof, leaf_hash, node_hash,
+    tree_head, verify_inclusion, verify_tree,
+)
+from .models import EncryptedVote, StudentRegistry, Vote, VoteJournalCheckpoint, VoterProfile
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Crash(Exception):
+    """Stands in for the applier process dying"""
+
+
+class VoteJournalTests(TestCase):
+    databases = {'default', 'audit'}
+
+    def setUp(self):
+        journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, journal_dir)
+        settings_override = override_settings(
+            VOTE_INTAKE_JOURNAL=True, VOTE_JOURNAL_DIR=journal_dir, CACHES=LOCMEM_CACHE
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.president = Position.objects.create(name='President', order=1)
+        self.secretary = Position.objects.create(name='Secretary', order=2)
+        self.alice = Candidate.objects.create(name='Alice', bio='', position=self.president)
+        self.bob = Candidate.objects.create(name='Bob', bio='', position=self.president)
+        self.carol = Candidate.objects.create(name='Carol', bio='', position=self.secretary)
+        self.voters = [self.make_voter(i) for i in range(3)]
+
+    def make_voter(self, i):
+        user = User.objects.create_user(f'voter{i}', password='pw')
+        return VoterProfile.objects.create(user=user, reg_number=f'R{i}')
+
+    def checkpoint(self):
+        return VoteJournalCheckpoint.objects.get()
+
+    def test_ballot_is_pending_until_applied(self):
+        voter = self.voters[0]
+        self.assertIsNotNone(append_ballot(voter, [self.alice, self.carol]))
+        self.assertEqual(pending_votes(voter), {self.president.id: self.alice.id, self.secretary.id: self.carol.id})
+        self.assertFalse(Vote.objects.exists())
+
+        self.assertEqual(JournalApplier().apply_pending(), (1, 0))
+
+        self.assertEqual(pending_votes(voter), {})
+        self.assertEqual(Vote.objects.filter(voter=voter).count(), 2)
+        self.assertEqual(EncryptedVote.objects.count(), 2)
+        self.assertEqual(vote_counts(), {self.alice.id: 1, self.carol.id: 1})
+        voter.refresh_from_db()
+        self.assertTrue(voter.has_voted)
+
+    def test_second_ballot_for_a_pending_position_is_refused(self):
+        voter = self.voters[0]
+        append_ballot(voter, [self.alice])
+        self.assertIsNone(append_ballot(voter, [self.bob]))
+        self.assertEqual(pending_votes(voter), {self.president.id: self.alice.id})
+
+    def test_duplicate_ballot_is_rejected(self):
+        voter = self.voters[0]
+        append_ballot(voter, [self.alice])
+        JournalApplier().apply_pending()
+
+        # The marker is gone once applied, so only the applier can catch this one
+        self.assertIsNotNone(append_ballot(voter, [self.bob]))
+        self.assertEqual(JournalApplier().apply_pending(), (0, 1))
+
+        self.assertEqual(list(Vote.objects.values_list('candidate_id', flat=True)), [self.alice.id])
+        self.assertEqual(vote_counts(), {self.alice.id: 1})
+        self.assertEqual((self.checkpoint().applied, self.checkpoint().rejected), (1, 1))
+        self.assertEqual(pending_votes(voter), {})
+
+    def test_ballot_repeating_a_position_is_rejected(self):
+        voter = self.voters[0]
+        append_ballot(voter, [self.alice, self.bob])
+        self.assertEqual(JournalApplier().apply_pending(), (0, 1))
+        self.assertFalse(Vote.objects.exists())
+
+    def test_torn_record_is_skipped(self):
+        append_ballot(self.voters[0], [self.alice])
+        # A writer that died before its fsync leaves part of a line behind
+        torn = _encode({'id': 'torn', 'voter': self.voters[1].id, 'votes': [[self.president.id, self.bob.id]]})
+        with open(journal_path(), 'ab') as f:
+            f.write(torn[:len(torn) // 2])
+        append_ballot(self.voters[2], [self.carol])
+
+        with self.assertLogs('election', 'WARNING'):
+            self.assertEqual(JournalApplier().apply_pending(), (2, 0))
+
+        self.assertEqual(
+            set(Vote.objects.values_list('voter_id', 'candidate_id')),
+            {(self.voters[0].id, self.alice.id), (self.voters[2].id, self.carol.id)},
+        )
+        self.assertEqual(self.checkpoint().offset, journal_path().stat().st_size)
+
+    def test_checksum_mismatch_is_skipped(self):
+        record = _encode({'id': 'bad', 'voter': self.voters[1].id, 'votes': [[self.president.id, self.bob.id]]})
+        append_ballot(self.voters[0], [self.alice])
+        with open(journal_path(), 'ab') as f:
+            f.write(record.replace(b'"bad"', b'"bac"'))
+        append_ballot(self.voters[2], [self.carol])
+
+        with self.assertLogs('election', 'WARNING'):
+            self.assertEqual(JournalApplier().apply_pending(), (2, 0))
+        self.assertFalse(Vote.objects.filter(voter=self.voters[1]).exists())
+
+    def test_resumes_from_checkpoint_after_reopening(self):
+        for voter, candidate in zip(self.voters, [self.alice, self.bob, self.alice]):
+            append_ballot(voter, [candidate])
+
+        self.assertEqual(JournalApplier(batch_size=2).apply_batch(), (2, 2, 0))
+        offset = self.checkpoint().offset
+
+        # A new applier, as after a restart, carries on from the stored offset
+        applier = JournalApplier(batch_size=2)
+        self.assertEqual(applier.apply_batch(), (1, 1, 0))
+        self.assertEqual(applier.apply_batch(), (0, 0, 0))
+
+        self.assertGreater(self.checkpoint().offset, offset)
+        self.assertEqual(self.checkpoint().applied, 3)
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(vote_counts(), {self.alice.id: 2, self.bob.id: 1})
+
+    def test_crash_before_commit_applies_batch_once_on_restart(self):
+        voter = self.voters[0]
+        append_ballot(voter, [self.alice])
+        release = JournalApplier._release
+
+        def release_then_crash(applier, entries):
+            release(applier, entries)
+            raise Crash
+
+        # Die after removing the markers but before the batch commits
+        with mock.patch.object(JournalApplier, '_release', release_then_crash):
+            with self.assertRaises(Crash):
+                JournalApplier().apply_batch()
+
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(self.checkpoint().applied, 0)
+        self.assertEqual(pending_votes(voter), {})
+
+        # Without a marker a retry gets into the journal; the applier keeps only the first ballot
+        append_ballot(voter, [self.bob])
+        self.assertEqual(JournalApplier().apply_pending(), (1, 1))
+        self.assertEqual(list(Vote.objects.values_list('candidate_id', flat=True)), [self.alice.id])
+        self.assertEqual(EncryptedVote.objects.count(), 1)
+        self.assertEqual(vote_counts(), {self.alice.id: 1})
+
+    def test_commit_leaves_no_pending_markers(self):
+        for voter in self.voters:
+            append_ballot(voter, [self.alice])
+        JournalApplier(batch_size=1).apply_pending()
+
+        marker_dir = Path(journal_path().parent, 'pending')
+        self.assertEqual([path for path in marker_dir.rglob('*') if path.is_file()], [])
+
+    def test_votes_for_inactive_positions_do_not_finish_a_ballot(self):
+        treasurer = Position.objects.create(name='Treasurer', order=3)
+        dave = Candidate.objects.create(name='Dave', bio='', position=treasurer)
+        voter = self.voters[0]
+        append_ballot(voter, [dave])
+        JournalApplier().apply_pending()
+        Position.objects.filter(pk=treasurer.pk).update(is_active=False)
+
+        # Two votes for two active positions, but one of them is the withdrawn position
+        append_ballot(voter, [self.alice])
+        JournalApplier().apply_pending()
+        voter.refresh_from_db()
+        self.assertFalse(voter.has_voted)
+
+        append_ballot(voter, [self.carol])
+        JournalApplier().apply_pending()
+        voter.refresh_from_db()
+        self.assertTrue(voter.has_voted)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RegistryDepartmentsTests(TestCase):
+    def add_student(self, reg_number, department):
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentRegistry.objects.create(
+                reg_number=reg_number, full_name=reg_number, email=f'{reg_number}@example.com',
+                department=department, year_of_study=1,
+            )
+
+    def test_cached_until_registry_changes(self):
+        self.add_student('R1', 'Physics')
+        self.add_student('R2', 'Chemistry')
+        self.add_student('R3', 'Physics')
+
+        self.assertEqual(registry_departments(), ['Chemistry', 'Physics'])
+        with self.assertNumQueries(0):
+            self.assertEqual(registry_departments(), ['Chemistry', 'Physics'])
+
+        self.add_student('R4', 'Biology')
+        self.assertEqual(registry_departments(), ['Biology', 'Chemistry', 'Physics'])
+
+
+def reference_root(leaves):
+    """MTH from RFC 6962, section 2.1, written out recursively"""
+    if not leaves:
+        return EMPTY_ROOT
+    if len(leaves) == 1:
+        return leaves[0]
+    split = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return node_hash(reference_root(leaves[:split]), reference_root(leaves[split:]))
+
+
+def reference_path(index, leaves):
+    """PATH(m, D[n]) from RFC 6962, section 2.1.1"""
+    if len(leaves) <= 1:
+        return []
+    split = 1 << ((len(leaves) - 1).bit_length() - 1)
+    if index < split:
+        return reference_path(index, leaves[:split]) + [reference_root(leaves[split:])]
+    return reference_path(index - split, leaves[split:]) + [reference_root(leaves[:split])]
+
+
+MAX_LEAVES = 69
+
+
+class MerkleProofTests(TestCase):
+    def setUp(self):
+        self.leaves = [leaf_hash(str(i).encode()) for i in range(MAX_LEAVES)]
+        # Every complete subtree, as append_votes stores them
+        frontier = Frontier()
+        self.nodes = {}
+        for leaf in self.leaves:
+            self.nodes.update(((level, index), value) for level, index, value in frontier.append(leaf))
+
+    def test_subtrees_fold_to_reference_root(self):
+        for size in range(1, MAX_LEAVES + 1):
+            root = _fold([self.nodes[c] for c in _subtree(0, size)])
+            self.assertEqual(root, reference_root(self.leaves[:size]), size)
+
+    def test_frontier_root_matches_reference(self):
+        frontier = Frontier()
+        self.assertEqual(frontier.root(), EMPTY_ROOT)
+        for size, leaf in enumerate(self.leaves, 1):
+            frontier.append(leaf)
+            self.assertEqual(frontier.root(), reference_root(self.leaves[:size]), size)
+
+    def test_audit_path_matches_reference(self):
+        for size in range(1, MAX_LEAVES + 1):
+            for index in range(size):
+                path = [_fold([self.nodes[c] for c in sibling]) for sibling in _audit_path(index, size)]
+                self.assertEqual(path, reference_path(index, self.leaves[:size]), (index, size))
+
+    def test_verify_inclusion_accepts_reference_proofs(self):
+        for size in range(1, MAX_LEAVES + 1):
+            root = reference_root(self.leaves[:size])
+            for index in range(size):
+                path = reference_path(index, self.leaves[:size])
+                self.assertTrue(verify_inclusion(self.leaves[index], index, size, path, root), (index, size))
+
+    def test_verify_inclusion_rejects_bad_proofs(self):
+        for size in range(2, MAX_LEAVES + 1):
+            root = reference_root(self.leaves[:size])
+            for index in range(size):
+                leaf = self.leaves[index]
+                path = reference_path(index, self.leaves[:size])
+                wrong_leaf = self.leaves[(index + 1) % size]
+                self.assertFalse(verify_inclusion(wrong_leaf, index, size, path, root))
+                self.assertFalse(verify_inclusion(leaf, (index + 1) % size, size, path, root))
+                self.assertFalse(verify_inclusion(leaf, index, size, path[:-1], root))
+                self.assertFalse(verify_inclusion(leaf, index, size, path + [leaf], root))
+                self.assertFalse(verify_inclusion(leaf, index, size, [leaf_hash(b'forged')] + path[1:], root))
+                self.assertFalse(verify_inclusion(leaf, index, size, path, self.leaves[0]))
+                self.assertFalse(verify_inclusion(leaf, size, size, path, root))
+
+
+class MerkleTreeTests(TestCase):
+    def setUp(self):
+        votes = [
+            EncryptedVote(voter_hash=f'{i:064x}', position_id=i % 3, encrypted_vote_data=f'ballot {i}')
+            for i in range(MAX_LEAVES)
+        ]
+        # In a few batches, like separate ballots
+        for start in range(0, MAX_LEAVES, 10):
+            batch = votes[start:start + 10]
+            append_votes(batch)
+            EncryptedVote.objects.bulk_create(batch)
+        self.leaves = [vote.leaf_hash() for vote in votes]
+
+    def test_tree_head(self):
+        head = tree_head()
+        self.assertEqual(head['size'], MAX_LEAVES)
+        self.assertEqual(head['root'], reference_root(self.leaves))
+
+    def test_inclusion_proofs_match_reference(self):
+        for size in range(1, MAX_LEAVES + 1):
+            root = reference_root(self.leaves[:size])
+            for index in range(size):
+                proof = inclusion_proof(index, size)
+                self.assertEqual(proof['leaf_hash'], self.leaves[index])
+                self.assertEqual(proof['path'], reference_path(index, self.leaves[:size]), (index, size))
+                self.assertEqual(proof['root'], root)
+                self.assertTrue(verify_inclusion(proof['leaf_hash'], index, size, proof['path'], root))
+
+    def test_inclusion_proof_outside_tree(self):
+        self.assertIsNone(inclusion_proof(MAX_LEAVES))
+        self.assertIsNone(inclusion_proof(0, MAX_LEAVES + 1))
+        self.assertIsNone(inclusion_proof(3, 3))
+        self.assertEqual(inclusion_proof(MAX_LEAVES - 1)['size'], MAX_LEAVES)
+
+    def test_verify_tree_passes(self):
+        result = verify_tree(chunk_size=16)
+        self.assertTrue(result.ok, result.problems)
+        self.assertEqual(result.leaves, MAX_LEAVES)
+
+    def test_verify_tree_finds_tampered_ballot(self):
+        EncryptedVote.objects.filter(merkle_index=37).update(encrypted_vote_data='forged')
+
+        result = verify_tree(chunk_size=16)
+
+        self.assertFalse(result.ok)
+        self.assertIn('Stored node at level 0, index 37 does not match the ballots', result.problems)
+        self.assertTrue(any(problem.startswith('Recomputed root') for problem in result.problems))
+
+    def test_verify_tree_finds_missing_leaf(self):
+        EncryptedVote.objects.filter(merkle_index=20).delete()
+
+        result = verify_tree()
+
+        self.assertFalse(result.ok)
+        self.assertIn('Leaf index 20 is missing (next ballot has 21)', result.problems)
@@ -7,6 +7,7 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
     path('vote/<int:candidate_id>/confirm/', views.vote_confirm, name='vote_confirm'),
+    path('vote/ballot/', views.submit_ballot, name='submit_ballot'),
     path('vote/success/', views.vote_success, name='vote_success'),
     path('already-voted/', views.already_voted_view, name='already_voted'),
     path('not-eligible/', views.not_eligible_view, name='not_eligible'),
@@ -2,13 +2,17 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import transaction, models
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.http import Http404
 from django.utils import timezone
 
-from Voters.forms import CustomLoginForm, VoterRegistrationForm
-from .models import VoterProfile, Vote, EncryptedVote, StudentRegistry
+from Voters.forms import BallotForm, CustomLoginForm, VoterRegistrationForm
+from .intake import append_ballot, pending_votes
+from .middleware import get_voter_profile
+from .models import VoterProfile, Vote, EncryptedVote
 from Admin.models import Position, Candidate, ElectionSettings, AuditLog
+from Admin.ballot import get_ballot, mark_voted_positions
 
 def custom_404(request, exception):
     return render(request, '404.html', status=404)
@@ -24,23 +28,13 @@ def login_view(request):
             password = form.cleaned_data['password']
             category = form.cleaned_data['category']
             
-            # Try to authenticate with username first
-            user = authenticate(request, username=username, password=password)
-            
-            # If username auth fails and category is Voter, try with reg_number
-            if not user and category == 'Voter':
-                try:
-                    profile = VoterProfile.objects.get(reg_number=username)
-                    user = authenticate(request, username=profile.user.username, password=password)
-                except VoterProfile.DoesNotExist:
-                    pass
+            # Username, or reg_number for voters; the profile comes back with the user
+            user = authenticate(request, username=username, password=password, category=category)
             
             if user is not None:
-                # Get or create voter profile
-                profile, created = VoterProfile.objects.get_or_create(
-                    user=user,
-                    defaults={'category': category}
-                )
+                profile = get_voter_profile(user)
+                if profile is None:
+                    profile = VoterProfile.objects.create(user=user, category=category)
                 
                 # Check if user category matches and is approved
                 if profile.category == category and profile.is_approved:
@@ -97,10 +91,12 @@ def register_view(request):
 @login_required
 def dashboard(request):
     # Get or create voter profile
-    profile, created = VoterProfile.objects.get_or_create(
-        user=request.user,
-        defaults={'category': 'Voter'}
-    )
+    profile = request.voter_profile
+    if not profile:
+        profile, created = VoterProfile.objects.get_or_create(
+            user=request.user,
+            defaults={'category': 'Voter'}
+        )
     
     # Redirect admin users to admin dashboard
     if profile.category == 'Admin' or request.user.is_staff:
@@ -127,34 +123,33 @@ def dashboard(request):
         messages.info(request, 'Voting has ended.')
         return render(request, 'voters/voting_ended.html', {'election_settings': election_settings})
     
-    positions = Position.objects.filter(is_active=True).prefetch_related(
-        models.Prefetch(
-            'candidates',
-            queryset=Candidate.objects.filter(is_active=True)
-        )
-    )
-    
-    # Get user's votes
-    user_votes = Vote.objects.filter(voter=profile).values_list('candidate_id', flat=True)
+    # Shared ballot snapshot with the positions this voter has covered (including journalled ones)
+    voted_positions = set(Vote.objects.filter(voter=profile).values_list('position_id', flat=True))
+    voted_positions |= pending_votes(profile).keys()
+    positions = mark_voted_positions(get_ballot(), voted_positions)
     
     # Check if user has voted in any position
-    has_voted = Vote.objects.filter(voter=profile).exists() 
+    has_voted = bool(voted_positions)
+    positions_remaining = any(not position['voted'] for position in positions)
     
     context = {
         'positions': positions,
         'profile': profile,
         'has_voted': has_voted,
-        'user_votes': list(user_votes),
+        'positions_remaining': positions_remaining,
         'election_settings': election_settings,
     }
     
     return render(request, 'voters/voter_dashboard.html', context)
 
-@login_required
-def vote_confirm(request, candidate_id):
-    candidate = get_object_or_404(Candidate, id=candidate_id, is_active=True)
-    profile = get_object_or_404(VoterProfile, user=request.user)
-    
+def voter_profile_or_404(request):
+    """The profile loaded by VoterProfileMiddleware, or a 404 if the user has none"""
+    if not request.voter_profile:
+        raise Http404('Voter profile not found')
+    return request.voter_profile
+
+def voting_blocked(request, profile):
+    """Return a redirect if this profile may not vote right now, otherwise None"""
     # Check if user is admin
     if profile.category == 'Admin':
         messages.error(request, 'Administrators cannot vote.')
@@ -181,11 +176,22 @@ def vote_confirm(request, candidate_id):
         messages.error(request, 'Voting has ended.')
         return redirect('dashboard')
     
-    # Check if already voted for this position
+    return None
+
+@login_required
+def vote_confirm(request, candidate_id):
+    candidate = get_object_or_404(Candidate, id=candidate_id, is_active=True)
+    profile = voter_profile_or_404(request)
+    
+    blocked = voting_blocked(request, profile)
+    if blocked:
+        return blocked
+    
+    # Check if already voted for this position (unique (voter, position) index)
     existing_vote = Vote.objects.filter(
         voter=profile,
-        candidate__position=candidate.position
-    ).first()
+        position_id=candidate.position_id
+    ).select_related('candidate').first()
     
     if existing_vote:
         return render(request, 'voters/already_voted.html', {
@@ -193,21 +199,41 @@ def vote_confirm(request, candidate_id):
             'existing_candidate': existing_vote.candidate
         })
     
+    # Journalled but not yet applied
+    pending_candidate_id = pending_votes(profile).get(candidate.position_id)
+    if pending_candidate_id:
+        return render(request, 'voters/already_voted.html', {
+            'candidate': candidate,
+            'existing_candidate': Candidate.objects.filter(id=pending_candidate_id).first()
+        })
+    
     if request.method == 'POST':
-        with transaction.atomic():
-            # Create traditional vote record
-            Vote.objects.create(voter=profile, candidate=candidate)
-            
-            # Create encrypted vote for ballot secrecy
-            EncryptedVote.cast_vote(profile, candidate)
-            
-            # Check if user has voted for all positions
-            total_positions = Position.objects.filter(is_active=True).count()
-            user_votes = Vote.objects.filter(voter=profile).count()
-            
-            if user_votes >= total_positions:
-                profile.has_voted = True
-                profile.save()
+        if settings.VOTE_INTAKE_JOURNAL:
+            if append_ballot(profile, [candidate]) is None:
+                # A concurrent request journalled a vote for this position first
+                messages.error(request, 'You have already voted for this position.')
+                return redirect('dashboard')
+            return redirect('vote_success')
+        
+        try:
+            with transaction.atomic():
+                # Create traditional vote record
+                Vote.objects.create(voter=profile, candidate=candidate, position_id=candidate.position_id)
+                
+                # Create encrypted vote for ballot secrecy
+                EncryptedVote.cast_vote(profile, candidate)
+                
+                # Check if user has voted for all positions
+                total_positions = Position.objects.filter(is_active=True).count()
+                user_votes = Vote.objects.filter(voter=profile).count()
+                
+                if user_votes >= total_positions:
+                    profile.has_voted = True
+                    profile.save()
+        except IntegrityError:
+            # A concurrent request already recorded a vote for this position
+            messages.error(request, 'You have already voted for this position.')
+            return redirect('dashboard')
         
         return redirect('vote_success')
     
@@ -215,14 +241,79 @@ def vote_confirm(request, candidate_id):
         'candidate': candidate
     })
 
+@login_required
+def submit_ballot(request):
+    """Record votes for every selected position in one request and one transaction"""
+    if request.method != 'POST':
+        return redirect('dashboard')
+    
+    profile = voter_profile_or_404(request)
+    
+    blocked = voting_blocked(request, profile)
+    if blocked:
+        return blocked
+    
+    ballot = get_ballot()
+    form = BallotForm(ballot, request.POST)
+    selections = form.selections() if form.is_valid() else {}
+    if not selections:
+        messages.error(request, 'Please select a candidate for at least one position.')
+        return redirect('dashboard')
+    
+    # Positions this voter has already voted for
+    voted_positions = set(
+        Vote.objects.filter(voter=profile).values_list('position_id', flat=True)
+    ) | pending_votes(profile).keys()
+    if voted_positions & selections.keys():
+        messages.error(request, 'You have already voted for one or more of the selected positions.')
+        return redirect('dashboard')
+    
+    # Re-check against the database in case the ballot changed since the snapshot
+    candidates = list(
+        Candidate.objects.select_related('position').filter(
+            id__in=selections.values(),
+            is_active=True,
+            position__is_active=True
+        )
+    )
+    if len(candidates) != len(selections):
+        messages.error(request, 'The ballot has changed. Please review your selections and submit again.')
+        return redirect('dashboard')
+    
+    if settings.VOTE_INTAKE_JOURNAL:
+        if append_ballot(profile, candidates) is None:
+            # A concurrent submission for the same position won
+            messages.error(request, 'You have already voted for one or more of the selected positions.')
+            return redirect('dashboard')
+        return redirect('vote_success')
+    
+    try:
+        with transaction.atomic():
+            Vote.objects.bulk_create([
+                Vote(voter=profile, candidate=candidate, position_id=candidate.position_id)
+                for candidate in candidates
+            ])
+            EncryptedVote.cast_ballot(profile, candidates)
+            
+            # Mark as voted once every position on the ballot is covered
+            if len(voted_positions | selections.keys()) >= len(ballot):
+                profile.has_voted = True
+                profile.save(update_fields=['has_voted', 'updated_at'])
+    except IntegrityError:
+        # A concurrent submission for the same position won
+        messages.error(request, 'You have already voted for one or more of the selected positions.')
+        return redirect('dashboard')
+    
+    return redirect('vote_success')
+
 @login_required
 def vote_success(request):
-    profile = get_object_or_404(VoterProfile, user=request.user)
+    profile = voter_profile_or_404(request)
     return render(request, 'voters/vote_success.html', {'profile': profile})
 
 @login_required
 def already_voted_view(request):
-    profile = get_object_or_404(VoterProfile, user=request.user)
+    profile = voter_profile_or_404(request)
     return render(request, 'voters/already_voted.html', {'profile': profile})
 
 def logout_view(request):
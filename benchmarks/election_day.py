@@ -0,0 +1,323 @@
+"""
+Election-day load benchmark.
+
+Seeds a throwaway database with students, voters, positions and candidates,
+starts the project on a local port and replays the opening surge: every
+voter logs in, loads the dashboard and votes for every position, either as
+one ballot submission or one confirmation per candidate (``--mode``), with
+``--concurrency`` voters in flight at once. Reports throughput, latency
+percentiles, SQLite lock errors and query counts per endpoint.
+
+Runs fully offline. From the project root:
+
+    python -m benchmarks.election_day --voters 500 --positions 15 --concurrency 32
+
+Use ``--json results.json`` to save the numbers for comparing branches.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urlencode
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PASSWORD = 'Benchmark-Pass-123'
+ENDPOINTS = ['login_page', 'login', 'dashboard', 'vote_page', 'vote_confirm', 'submit_ballot']
+
+
+def setup_django(bench_dir, settings_module):
+    os.environ['BENCH_DIR'] = str(bench_dir)
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    sys.path.insert(0, str(BASE_DIR))
+
+    import django
+    django.setup()
+
+
+def seed(voters, positions, candidates_per_position):
+    """Create the election in bulk and return {position_id: [candidate ids]}"""
+    from django.conf import settings
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from Admin.models import Candidate, ElectionSettings, Position
+    from Voters.models import StudentRegistry, VoterProfile
+
+    for alias in settings.DATABASES:
+        call_command('migrate', database=alias, verbosity=0)
+
+    ElectionSettings.objects.create(name='Benchmark Election', is_active=True)
+
+    Position.objects.bulk_create([
+        Position(name=f'Position {p}', order=p) for p in range(positions)
+    ])
+    Candidate.objects.bulk_create([
+        Candidate(name=f'Candidate {p}-{c}', bio='Benchmark candidate', position=position)
+        for p, position in enumerate(Position.objects.all())
+        for c in range(candidates_per_position)
+    ])
+
+    reg_numbers = [f'BENCH{v:06d}/25' for v in range(voters)]
+    StudentRegistry.objects.bulk_create([
+        StudentRegistry(
+            reg_number=reg_number,
+            full_name=f'Voter {v}',
+            email=f'voter{v}@example.com',
+            department=f'Department {v % 8}',
+            year_of_study=v % 4 + 1
+        )
+        for v, reg_number in enumerate(reg_numbers)
+    ])
+
+    # Hash once; every benchmark voter shares the password
+    password_hash = make_password(PASSWORD)
+    User.objects.bulk_create([
+        User(username=f'voter{v}', password=password_hash) for v in range(voters)
+    ])
+    users = User.objects.filter(username__startswith='voter').in_bulk(field_name='username')
+    VoterProfile.objects.bulk_create([
+        VoterProfile(
+            user=users[f'voter{v}'],
+            category='Voter',
+            reg_number=reg_number,
+            department=f'Department {v % 8}',
+            year_of_study=v % 4 + 1
+        )
+        for v, reg_number in enumerate(reg_numbers)
+    ])
+
+    ballot = {}
+    for candidate_id, position_id in Candidate.objects.values_list('id', 'position_id'):
+        ballot.setdefault(position_id, []).append(candidate_id)
+    return ballot
+
+
+def start_server(server, port, workers, env):
+    if server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'StudentsElection.wsgi',
+            '--workers', str(workers),
+            '--bind', f'127.0.0.1:{port}',
+            '--log-level', 'warning',
+        ]
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{server} exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError(f'{server} did not start listening on port {port}')
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {endpoint: [] for endpoint in ENDPOINTS}
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, sample):
+        with self.lock:
+            self.samples[endpoint].append(sample)
+
+
+class Session:
+    """A single voter's browser: one keep-alive connection plus cookies"""
+
+    def __init__(self, port, recorder):
+        self.port = port
+        self.recorder = recorder
+        self.cookies = {}
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def request(self, endpoint, method, path, data=None):
+        headers = {}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        if method == 'POST':
+            body = urlencode(data or {})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.recorder.add(endpoint, {
+                'latency': time.perf_counter() - start,
+                'status': 0, 'queries': 0, 'db_time': 0.0, 'locked': False,
+            })
+            return None
+        latency = time.perf_counter() - start
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+
+        self.recorder.add(endpoint, {
+            'latency': latency,
+            'status': response.status,
+            'queries': int(response.headers.get('X-DB-Queries', 0)),
+            'db_time': float(response.headers.get('X-DB-Time', 0)),
+            'locked': response.headers.get('X-DB-Locked') == '1',
+        })
+        return response
+
+    def close(self):
+        self.connection.close()
+
+
+def run_voter(voter, ballot, port, recorder, mode):
+    session = Session(port, recorder)
+    try:
+        session.request('login_page', 'GET', '/login/')
+        response = session.request('login', 'POST', '/login/', {
+            'username': f'voter{voter}',
+            'password': PASSWORD,
+            'category': 'Voter',
+        })
+        if response is None or response.status != 302:
+            return
+
+        session.request('dashboard', 'GET', '/dashboard/')
+        if mode == 'ballot':
+            session.request('submit_ballot', 'POST', '/vote/ballot/', {
+                f'position_{position_id}': random.choice(candidates)
+                for position_id, candidates in ballot.items()
+            })
+            return
+
+        for candidates in ballot.values():
+            candidate_id = random.choice(candidates)
+            session.request('vote_page', 'GET', f'/vote/{candidate_id}/confirm/')
+            session.request('vote_confirm', 'POST', f'/vote/{candidate_id}/confirm/')
+    finally:
+        session.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed, positions):
+    summary = {'elapsed': elapsed, 'endpoints': {}}
+
+    for endpoint, samples in recorder.samples.items():
+        latencies = sorted(s['latency'] * 1000 for s in samples)
+        count = len(samples)
+        summary['endpoints'][endpoint] = {
+            'requests': count,
+            'errors': sum(1 for s in samples if s['status'] == 0 or s['status'] >= 500),
+            'locked': sum(1 for s in samples if s['locked']),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'avg_queries': sum(s['queries'] for s in samples) / count if count else 0,
+            'avg_db_ms': sum(s['db_time'] for s in samples) / count if count else 0,
+        }
+
+    total_requests = sum(len(samples) for samples in recorder.samples.values())
+    votes = sum(1 for s in recorder.samples['vote_confirm'] if s['status'] == 302)
+    ballots = sum(1 for s in recorder.samples['submit_ballot'] if s['status'] == 302)
+    votes += ballots * positions
+    summary['requests_per_second'] = total_requests / elapsed if elapsed else 0
+    summary['votes'] = votes
+    summary['votes_per_second'] = votes / elapsed if elapsed else 0
+    summary['lock_errors'] = sum(e['locked'] for e in summary['endpoints'].values())
+    return summary
+
+
+def print_summary(summary):
+    print()
+    print(f"{'Endpoint':<14}{'Requests':>9}{'Errors':>8}{'Locked':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Queries':>9}{'DB ms':>8}")
+    for endpoint, stats in summary['endpoints'].items():
+        if not stats['requests']:
+            continue
+        print(f"{endpoint:<14}{stats['requests']:>9}{stats['errors']:>8}{stats['locked']:>8}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+              f"{stats['avg_queries']:>9.1f}{stats['avg_db_ms']:>8.1f}")
+    print()
+    print(f"Wall time:        {summary['elapsed']:.2f}s")
+    print(f"Throughput:       {summary['requests_per_second']:.1f} requests/s")
+    print(f"Votes recorded:   {summary['votes']} ({summary['votes_per_second']:.1f} votes/s)")
+    print(f"SQLite lock errors: {summary['lock_errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--voters', type=int, default=200)
+    parser.add_argument('--positions', type=int, default=5)
+    parser.add_argument('--candidates', type=int, default=4, help='Candidates per position')
+    parser.add_argument('--concurrency', type=int, default=16, help='Voters in flight at once')
+    parser.add_argument('--mode', choices=['ballot', 'per-candidate'], default='ballot',
+                        help='Submit the whole ballot at once or confirm one candidate at a time')
+    parser.add_argument('--server', choices=['gunicorn', 'runserver'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--settings', default='benchmarks.settings', help='Settings module to benchmark')
+    parser.add_argument('--bench-dir', default=str(BASE_DIR / 'benchmarks' / 'run'))
+    parser.add_argument('--json', help='Write the summary to this file')
+    args = parser.parse_args(argv)
+
+    bench_dir = Path(args.bench_dir)
+    shutil.rmtree(bench_dir, ignore_errors=True)
+    bench_dir.mkdir(parents=True)
+
+    setup_django(bench_dir, args.settings)
+    print(f'Seeding {args.voters} voters, {args.positions} positions, '
+          f'{args.candidates} candidates per position...')
+    ballot = seed(args.voters, args.positions, args.candidates)
+
+    env = dict(os.environ, BENCH_DIR=str(bench_dir), DJANGO_SETTINGS_MODULE=args.settings)
+    server = start_server(args.server, args.port, args.workers, env)
+
+    recorder = Recorder()
+    try:
+        print(f'Running {args.voters} voters with concurrency {args.concurrency} against {args.server}...')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for _ in executor.map(lambda v: run_voter(v, ballot, args.port, recorder, args.mode), range(args.voters)):
+                pass
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    summary = summarize(recorder, elapsed, args.positions)
+    summary['config'] = vars(args)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
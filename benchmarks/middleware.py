@@ -0,0 +1,38 @@
+import time
+from contextlib import ExitStack
+
+from django.db import OperationalError, connections
+
+
+class QueryCountMiddleware:
+    """Adds X-DB-Queries, X-DB-Time and X-DB-Locked headers for the load driver"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = {'queries': 0, 'time': 0.0}
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats['queries'] += 1
+                stats['time'] += time.perf_counter() - start
+
+        request.db_locked = False
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count_query))
+            response = self.get_response(request)
+
+        response['X-DB-Queries'] = str(stats['queries'])
+        response['X-DB-Time'] = f"{stats['time'] * 1000:.2f}"
+        response['X-DB-Locked'] = '1' if request.db_locked else '0'
+        return response
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, OperationalError) and 'locked' in str(exception):
+            request.db_locked = True
+        return None
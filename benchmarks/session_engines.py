@@ -0,0 +1,89 @@
+"""
+Session engine benchmark.
+
+Runs the election-day benchmark once per session engine on fresh databases
+and prints the average number of database queries per request, per
+endpoint and overall, side by side. Engines are picked through the
+BENCH_SESSION_ENGINE variable that benchmarks.settings reads.
+
+From the project root:
+
+    python -m benchmarks.session_engines --voters 200 --concurrency 16
+
+Any other options are passed through to election_day.py.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+ENGINES = [
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+    ('cache', 'django.contrib.sessions.backends.cache'),
+    ('signed_cookies', 'django.contrib.sessions.backends.signed_cookies'),
+]
+
+# Endpoints every run exercises, whichever voting mode is used
+COLUMNS = ['login', 'dashboard', 'vote_page', 'vote_confirm', 'submit_ballot']
+
+
+def run_engine(engine, passthrough):
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / 'summary.json'
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.election_day', '--json', str(output), *passthrough],
+            cwd=BASE_DIR,
+            env=dict(os.environ, BENCH_SESSION_ENGINE=engine),
+            check=True,
+        )
+        return json.loads(output.read_text())
+
+
+def queries_per_request(summary):
+    endpoints = summary['endpoints'].values()
+    requests = sum(e['requests'] for e in endpoints)
+    queries = sum(e['avg_queries'] * e['requests'] for e in endpoints)
+    return queries / requests if requests else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='+', choices=[name for name, _ in ENGINES],
+                        default=[name for name, _ in ENGINES])
+    parser.add_argument('--json', help='Write every summary to this file')
+    args, passthrough = parser.parse_known_args(argv)
+
+    summaries = {}
+    for name, engine in ENGINES:
+        if name in args.engines:
+            print(f'\n=== {name} ({engine}) ===')
+            summaries[name] = run_engine(engine, passthrough)
+
+    columns = [c for c in COLUMNS if any(s['endpoints'][c]['requests'] for s in summaries.values())]
+    print('\nAverage database queries per request')
+    print(f"{'Engine':<16}" + ''.join(f'{c:>14}' for c in columns) + f"{'All':>8}{'Votes/s':>10}")
+    for name, summary in summaries.items():
+        cells = ''.join(f"{summary['endpoints'][c]['avg_queries']:>14.2f}" for c in columns)
+        print(f'{name:<16}{cells}{queries_per_request(summary):>8.2f}{summary["votes_per_second"]:>10.1f}')
+
+    if 'db' in summaries:
+        baseline = queries_per_request(summaries['db'])
+        for name, summary in summaries.items():
+            if name != 'db' and baseline:
+                saved = baseline - queries_per_request(summary)
+                print(f'{name}: {saved:.2f} fewer queries per request than db ({saved / baseline:.0%})')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summaries, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Settings for the election-day benchmark.
+
+Runs the real project settings against a throwaway database and cache so a
+benchmark never touches db.sqlite3. election_day.py sets BENCH_DIR.
+"""
+
+import os
+from pathlib import Path
+
+from StudentsElection.settings import *  # noqa: F401,F403
+
+BENCH_DIR = Path(os.environ.get('BENCH_DIR', BASE_DIR / 'benchmarks' / 'run'))
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES = {
+    alias: {**config, 'NAME': BENCH_DIR / f'{alias}.sqlite3'}
+    for alias, config in DATABASES.items()
+}
+
+# No collectstatic step, so skip the manifest lookup
+STORAGES = {
+    **STORAGES,
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BENCH_DIR / 'cache',
+    }
+}
+
+# session_engines.py runs the benchmark once per engine
+SESSION_ENGINE = os.environ.get('BENCH_SESSION_ENGINE', SESSION_ENGINE)
+
+# Report per-request query counts and database errors back to the load driver.
+# Outside SessionMiddleware and AuthenticationMiddleware, so the session load
+# and save and the user lookup are counted too.
+_outermost = MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1
+MIDDLEWARE = MIDDLEWARE[:_outermost] + ['benchmarks.middleware.QueryCountMiddleware'] + MIDDLEWARE[_outermost:]
@@ -0,0 +1,13 @@
+"""
+Benchmark settings with Django's stock SQLite connection handling.
+
+Same as benchmarks.settings but without the SQLITE_OPTIONS profile or
+persistent connections, for comparing against the tuned configuration.
+"""
+
+from benchmarks.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': config['NAME']}
+    for alias, config in DATABASES.items()
+}
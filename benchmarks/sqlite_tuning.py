@@ -0,0 +1,78 @@
+"""
+SQLite tuning benchmark.
+
+Runs the election-day benchmark twice on fresh databases: once with Django's
+stock SQLite settings (benchmarks.settings_baseline) and once with the
+project's SQLITE_OPTIONS profile and persistent connections
+(benchmarks.settings), then prints vote throughput, latency and lock errors
+side by side.
+
+From the project root:
+
+    python -m benchmarks.sqlite_tuning --voters 300 --concurrency 32 --workers 4
+
+Any other options are passed through to election_day.py.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PROFILES = [
+    ('stock', 'benchmarks.settings_baseline'),
+    ('tuned', 'benchmarks.settings'),
+]
+
+
+def run_profile(settings_module, passthrough):
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / 'summary.json'
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.election_day',
+             '--settings', settings_module, '--json', str(output), *passthrough],
+            cwd=BASE_DIR,
+            check=True,
+        )
+        return json.loads(output.read_text())
+
+
+def vote_latency(summary):
+    """p95 of whichever endpoint recorded the votes"""
+    endpoints = summary['endpoints']
+    name = 'submit_ballot' if endpoints['submit_ballot']['requests'] else 'vote_confirm'
+    return endpoints[name]['p95_ms']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', help='Write both summaries to this file')
+    args, passthrough = parser.parse_known_args(argv)
+
+    summaries = {}
+    for name, settings_module in PROFILES:
+        print(f'\n=== {name} ({settings_module}) ===')
+        summaries[name] = run_profile(settings_module, passthrough)
+
+    print()
+    print(f"{'Profile':<10}{'Votes/s':>10}{'Requests/s':>12}{'Vote p95 ms':>13}{'Errors':>8}{'Locked':>8}")
+    for name, summary in summaries.items():
+        errors = sum(e['errors'] for e in summary['endpoints'].values())
+        print(f"{name:<10}{summary['votes_per_second']:>10.1f}{summary['requests_per_second']:>12.1f}"
+              f"{vote_latency(summary):>13.1f}{errors:>8}{summary['lock_errors']:>8}")
+
+    stock, tuned = summaries['stock'], summaries['tuned']
+    if stock['votes_per_second']:
+        print(f"\nVote throughput: {tuned['votes_per_second'] / stock['votes_per_second']:.2f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summaries, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()